@@ -14,11 +14,22 @@ from pathlib import Path
 import random
 from string import ascii_uppercase
 import os
-import json
+import copy
 import uuid
 import csv
-from collections import defaultdict
 from movies.scrape import scraper
+from movies.votes import RoomVotes, top_k
+from movies.feeds import FeedCache
+from movies.colike import ColikeModel
+from movies.cards import CardQueues
+from movies.tally import RoomTallies
+from movies.catalog import legacy_ids
+from movies.client import client_stats
+from storage.store import RoomStore
+from storage.sqlite_store import SqliteRoomStore
+from storage.sweeper import RoomSweeper
+from storage.bus import make_room_bus
+import atexit
 import logging
 
 logging.basicConfig(
@@ -28,22 +39,92 @@ logger = logging.getLogger(__name__)
 
 ENV_PATH = Path(__file__).parent / ".env"
 JSON_ROOMS = Path(__file__).parent / "data" / "rooms.json"
+SQLITE_ROOMS = Path(__file__).parent / "data" / "rooms.sqlite"
+ROOMS_ARCHIVE = Path(__file__).parent / "data" / "rooms.archive.jsonl"
 MOVIES_CSV = Path(__file__).parent / "movies" / "results" / "movies.csv"
+COLIKE_MODEL = Path(__file__).parent / "movies" / "results" / "colike"
 load_dotenv(ENV_PATH)
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
-socketio = SocketIO(app)
+ROOM_BUS = os.getenv("ROOM_BUS", "")
+socketio_options = {}
+
+if ROOM_BUS:
+
+    room_bus = make_room_bus(ROOM_BUS)
+
+    if room_bus is not None:
+        socketio_options["client_manager"] = room_bus
+    else:
+        socketio_options["message_queue"] = ROOM_BUS
+
+socketio = SocketIO(app, **socketio_options)
 
 movie_scraper = scraper(api_key="use_local")
 base_url = os.getenv("BASE_URL", "http://127.0.0.1:5000/")
+FEED_SHORTLIST = int(os.getenv("FEED_SHORTLIST", "20"))
+PREFERENCE_BOOST = 2
+feed_cache = FeedCache(int(os.getenv("FEED_CACHE_SIZE", "1024")))
+COLIKE_WEIGHT = float(os.getenv("COLIKE_WEIGHT", "1"))
+CONTENT_WEIGHT = float(os.getenv("CONTENT_WEIGHT", "1"))
+card_queues = CardQueues(int(os.getenv("CARD_QUEUE_DEPTH", "10")))
+
+ROOMS_BACKEND = os.getenv("ROOMS_BACKEND", "json")
+
+if ROOM_BUS and ROOMS_BACKEND != "sqlite":
+    logger.warning(
+        "ROOM_BUS is set but rooms are stored per process; use ROOMS_BACKEND=sqlite"
+    )
+lock_warn_after = float(os.getenv("ROOM_LOCK_WARN_MS", "50")) / 1000
 
+if ROOMS_BACKEND == "sqlite":
 
-def clear_rooms():
+    room_store = SqliteRoomStore(
+        os.getenv("ROOMS_SQLITE_PATH", SQLITE_ROOMS),
+        import_from=JSON_ROOMS,
+        lock_warn_after=lock_warn_after,
+        legacy_ids=legacy_ids(MOVIES_CSV),
+    )
+
+else:
 
-    with open(JSON_ROOMS, "w") as f:
+    room_store = RoomStore(
+        JSON_ROOMS,
+        flush_interval=float(os.getenv("ROOMS_FLUSH_INTERVAL", "30")),
+        flush_batch=int(os.getenv("ROOMS_FLUSH_BATCH", "1000")),
+        journal_fsync=os.getenv("ROOMS_JOURNAL_FSYNC", "0") == "1",
+        lock_warn_after=lock_warn_after,
+        legacy_ids=legacy_ids(MOVIES_CSV),
+    )
 
-        json.dump({}, f, indent=4)
+room_votes = RoomVotes(movie_scraper.index.positions, len(movie_scraper.index))
+room_tallies = RoomTallies()
+colike_model = ColikeModel(
+    os.getenv("COLIKE_MODEL_PATH", COLIKE_MODEL),
+    movie_scraper.index.positions,
+    len(movie_scraper.index),
+)
+room_store.listeners.append(room_votes.observe)
+room_store.listeners.append(room_tallies.observe)
+
+room_store.start()
+atexit.register(room_store.close)
+
+room_sweeper = RoomSweeper(
+    room_store,
+    idle_ttl=int(os.getenv("ROOM_IDLE_TTL", str(6 * 3600))),
+    max_age=int(os.getenv("ROOM_MAX_AGE", str(48 * 3600))),
+    interval=float(os.getenv("ROOM_SWEEP_INTERVAL", "60")),
+    archive_path=os.getenv("ROOMS_ARCHIVE_PATH", ROOMS_ARCHIVE) or None,
+)
+room_sweeper.start()
+atexit.register(room_sweeper.close)
+
+
+def clear_rooms():
+
+    room_store.clear()
 
 
 def default_member_rooms(name, is_host=False):
@@ -56,10 +137,10 @@ def default_member_rooms(name, is_host=False):
     }
 
 
-def get_initial_random_feed(min_rating=None):
+def get_initial_random_feed(room_data, member_id, min_rating=None):
 
-    rooms = load_rooms()
-    total_members_in_room = len(rooms[session["room"]]["members"].keys())
+    total_members_in_room = len(room_data["members"].keys())
+    catalog = movie_scraper.catalog
 
     if min_rating:
 
@@ -71,17 +152,13 @@ def get_initial_random_feed(min_rating=None):
 
             min_rating = 7
 
-        movie_scraper.by_min_rating(min_rating)
-
-    else:
-
-        movie_scraper.selected_df = movie_scraper.get_all()
+        catalog = catalog.where(min_rating=min_rating)
 
     max_suggestions = 0.7 * 10
 
     try:
 
-        suggested_titles = rooms[session["room"]]["members"][session["member_id"]].get(
+        suggested_titles = room_data["members"][member_id].get(
             "suggested_from_llm", []
         )
 
@@ -97,9 +174,10 @@ def get_initial_random_feed(min_rating=None):
 
             suggested_titles = random.sample(suggested_titles, int(max_suggestions))
 
-        _, suggested_titles = movie_scraper.exclude_list_of_titles(suggested_titles)
+        suggested = catalog.titled(suggested_titles)
+        catalog = catalog.exclude(suggested_titles)
 
-        suggested_titles = suggested_titles.to_dict(orient="records")
+        suggested_titles = suggested.records()
 
     else:
 
@@ -108,204 +186,224 @@ def get_initial_random_feed(min_rating=None):
     random_movies = movie_scraper.get_random_movies(
         n=20 - len(suggested_titles),
         priority="Rating",
-        pool=min(len(movie_scraper.selected_df) - 5, total_members_in_room * 30),
+        pool=min(len(catalog) - 5, total_members_in_room * 30),
+        movies=catalog,
     )
 
     random_movies.extend(suggested_titles)
 
     movies = []
+    details = movie_scraper.enrich_many(
+        [(movie["title"], movie["year"]) for movie in random_movies]
+    )
 
-    for movie in random_movies:
-
-        more_movie_info = movie_scraper.enrich_movie_details(
-            movie["Title"], movie["Year"]
-        )
+    for movie, more_movie_info in zip(random_movies, details):
 
         movies.append(
             {
                 "id": movie["id"],
-                "title": movie["Title"],
-                "year": str(movie["Year"]),
+                "title": movie["title"],
+                "year": movie["year"],
                 "poster": more_movie_info.get("poster", "N/A"),
                 "plot": more_movie_info.get("plot", "No description available."),
                 "genre": more_movie_info.get("genre", "N/A"),
                 "director": more_movie_info.get("director", "N/A"),
                 "actors": more_movie_info.get("actors", "N/A"),
-                "rating": float(movie["Rating"]),
-                "score": float(movie["Rating"]),
+                "rating": movie["rating"],
+                "score": movie["rating"],
             }
         )
 
     return movies
 
 
-def calculate_personalized_feed(room_data, member_id, min_rating=None):
+def calculate_personalized_feed(
+    room, room_data, member_id, min_rating=None, limit=5
+):
 
     current_member = room_data["members"][member_id]
-    current_choices = current_member["movie_choices"]
-
-    if min_rating:
-        filtered_df = movie_scraper.by_min_rating(min_rating)
-    else:
-        filtered_df = movie_scraper.get_all()
-
-    all_movies = {}
-    for idx, row in filtered_df.iterrows():
-        all_movies[str(idx)] = {
-            "id": str(idx),
-            "title": row["Title"],
-            "year": str(row["Year"]),
-            "rating": float(row["Rating"]),
-        }
-
-    unrated_movies = {
-        mid: m for mid, m in all_movies.items() if mid not in current_choices
-    }
 
     total_choices = sum(
         len(member["movie_choices"]) for member in room_data["members"].values()
     )
     if total_choices == 0:
-        return get_initial_random_feed(min_rating)
 
-    mutual_likes = room_data.get("mutual_likes", {})
+        return get_initial_random_feed(room_data, member_id, min_rating)[:limit]
 
-    movie_scores = defaultdict(lambda: {"score": 0, "voters": 0})
+    collaborative, like_counts, candidates = room_votes.scores(
+        room, room_data, member_id
+    )
 
-    for other_id, other_member in room_data["members"].items():
+    catalog = movie_scraper.index
+    candidates &= catalog.distinct_titles
+    positions = catalog.all.where(min_rating=min_rating).positions
+    positions = positions[candidates[positions]]
 
-        if other_id == member_id:
+    user_preferences = current_member.get("survey", {}).get("preferences") or ""
 
-            continue
+    liked_ids = [
+        mid
+        for mid, choice in current_member["movie_choices"].items()
+        if choice == "like"
+    ]
 
-        common_likes = set()
-        common_dislikes = set()
+    local_scores = (
+        collaborative[positions] * 2.5
+        + catalog.ratings[positions] / 10.0
+        + like_counts[positions] * (2 + like_counts[positions])
+        + colike_model.scores(liked_ids)[positions] * COLIKE_WEIGHT
+    )
 
-        for mid, choice in current_choices.items():
+    liked_positions = [catalog.positions[mid] for mid in liked_ids if mid in catalog]
 
-            if mid in other_member["movie_choices"]:
+    if CONTENT_WEIGHT and (liked_positions or user_preferences.strip()):
 
-                if choice == other_member["movie_choices"][mid]:
+        content = movie_scraper.content.scores(liked_positions, user_preferences)
+        local_scores += content[positions] * CONTENT_WEIGHT
 
-                    if choice == "like":
+    boosted = (
+        local_scores
+        + movie_scraper.preferences.compile(user_preferences, PREFERENCE_BOOST)[
+            positions
+        ]
+    )
 
-                        common_likes.add(mid)
+    shortlist = [
+        (float(local_scores[i]), catalog.record_at(positions[i]))
+        for i in top_k(boosted, FEED_SHORTLIST)
+    ]
+    enriched = movie_scraper.enrich_many(
+        [(movie["title"], movie["year"]) for _, movie in shortlist]
+    )
 
-                    else:
+    sorted_movies = []
 
-                        common_dislikes.add(mid)
+    for (local_score, movie), details in zip(shortlist, enriched):
 
-        similarity = len(common_likes) + len(common_dislikes)
+        movie["poster"] = details.get("poster", "N/A")
+        movie["plot"] = details.get("plot", "No description available.")
+        movie["genre"] = details.get("genre", "N/A")
+        movie["director"] = details.get("director", "N/A")
+        movie["actors"] = details.get("actors", "N/A")
 
-        for mid, choice in other_member["movie_choices"].items():
+        movie_text = f"{movie['genre']} {movie['actors']} {movie['director']}"
+        final_score = local_score
 
-            if mid in unrated_movies:
+        if movie_scraper.preferences.matches(user_preferences, movie_text):
+            final_score += PREFERENCE_BOOST
+        sorted_movies.append({**movie, "score": final_score})
 
-                if choice == "like":
+    sorted_movies.sort(key=lambda x: x["score"], reverse=True)
 
-                    movie_scores[mid]["score"] += 1 + similarity * 0.5
-                    movie_scores[mid]["voters"] += 1
+    return sorted_movies[:limit]
 
-                elif choice == "dislike":
 
-                    movie_scores[mid]["score"] -= 0.5 + similarity * 0.3
+def member_min_rating(room_data, member_id):
 
-    sorted_movies = []
-    seen_titles = set()
-    user_preferences = current_member.get("survey", {}).get("preferences", "").lower()
+    user_survey = room_data["members"][member_id].get("survey", {})
 
-    for mid, movie in unrated_movies.items():
+    if isinstance(user_survey, dict):
+        return user_survey.get("min_rating")
 
-        if movie["title"] in seen_titles:
-            continue
-        seen_titles.add(movie["title"])
+    return None
 
-        collaborative_score = movie_scores[mid]["score"]
-        base_score = movie["rating"] / 10.0
 
-        mutual_likes_boost = 0
+def forget_room_cards(record, previous_seq):
 
-        if mid in mutual_likes:
+    if record["op"] == "delete":
+        card_queues.discard_room(record["room"])
 
-            num_likes = len(mutual_likes[mid])
 
-            mutual_likes_boost = num_likes * (2 + num_likes)
+room_store.listeners.append(forget_room_cards)
 
-        preference_boost = 0
-        details = movie_scraper.enrich_movie_details(movie["title"], movie["year"])
-        movie["poster"] = details.get("poster", "N/A")
-        movie["plot"] = details.get("plot", "No description available.")
-        movie["genre"] = details.get("genre", "N/A")
-        movie["director"] = details.get("director", "N/A")
-        movie["actors"] = details.get("actors", "N/A")
 
-        if user_preferences:
-            movie_text = (
-                f"{details['genre']} {details['actors']} {details['director']}".lower()
-            )
-            if any(pref in movie_text for pref in user_preferences.split()):
-                preference_boost = 2
-
-        final_score = (
-            collaborative_score * 2.5
-            + base_score
-            + mutual_likes_boost
-            + preference_boost
+def member_channel(room, member_id):
+
+    return f"{room}:{member_id}"
+
+
+def snapshot_room(room_data):
+
+    snapshot = {key: value for key, value in room_data.items() if key != "data"}
+
+    return copy.deepcopy(snapshot)
+
+
+def cached_feed(room, room_data, member_id, limit=5):
+
+    min_rating = member_min_rating(room_data, member_id)
+    feed_key = (room, member_id, room_data.get("version", 0), min_rating, limit)
+    feed = feed_cache.get(feed_key)
+
+    if feed is None:
+
+        feed = calculate_personalized_feed(
+            room, room_data, member_id, min_rating=min_rating, limit=limit
         )
-        sorted_movies.append({**movie, "score": final_score})
+        feed_cache.put(feed_key, feed)
 
-    sorted_movies.sort(key=lambda x: x["score"], reverse=True)
+    return feed
 
-    return sorted_movies[:5]
 
+def top_up_cards(room):
 
-def update_rooms(rooms_data):
-    try:
-        with open(JSON_ROOMS, "w") as f:
-            json.dump(rooms_data, f, indent=4)
-    except Exception as e:
-        pass
+    with room_store.transaction(room) as room_data:
 
+        if room_data is None or room_data.get("voting_complete", False):
+            return
 
-def load_rooms():
-    with open(JSON_ROOMS, "r") as f:
-        return json.load(f)
+        room_data = snapshot_room(room_data)
 
+    for member_id, member in room_data["members"].items():
 
-def check_voting_complete(room_data):
-    members = room_data["members"]
-    mutual_likes = room_data.get("mutual_likes", {})
-    total_members = len(members)
+        # Queues live in the process holding the member's socket; with several
+        # workers, members connected elsewhere are topped up by their own worker.
+        if not card_queues.connected(room, member_id):
+            continue
 
-    if total_members == 0:
-        return False, []
+        stale = card_queues.remove(room, member_id, list(member["movie_choices"]))
+        wanted = card_queues.claim(room, member_id)
+        movies = []
 
-    everyone_done_10 = all(
-        len(member["movie_choices"]) >= 10 for member in members.values()
-    )
+        try:
 
-    everyone_done_20 = all(
-        len(member["movie_choices"]) >= 20 for member in members.values()
-    )
+            if wanted:
 
-    has_universal_like = any(
-        len(likers) == total_members for likers in mutual_likes.values()
-    )
+                # claim only hands out a top-up once the queue is at or below
+                # low water, so fewer than depth cards are queued and the top
+                # depth of the shared feed still leaves wanted unqueued ones.
+                queued = set(card_queues.queued(room, member_id))
+                movies = [
+                    movie
+                    for movie in cached_feed(
+                        room, room_data, member_id, limit=card_queues.depth
+                    )
+                    if movie["id"] not in queued
+                ][:wanted]
+                added = set(
+                    card_queues.add(room, member_id, [movie["id"] for movie in movies])
+                )
+                movies = [movie for movie in movies if movie["id"] in added]
 
-    if everyone_done_20 or (everyone_done_10 and has_universal_like):
-        top_movies = []
-        for movie_id, likers in mutual_likes.items():
-            top_movies.append(
-                {"movie_id": movie_id, "likes": len(likers), "likers": likers}
-            )
+        except Exception as e:
 
-        if len(top_movies) == 0:
-            return True, []
+            logger.error(f"Card top-up failed for {member_id} in room {room}: {e}")
 
-        top_movies.sort(key=lambda x: x["likes"], reverse=True)
-        return True, top_movies[:3]
+        finally:
 
-    return False, []
+            if wanted:
+                card_queues.release(room, member_id)
+
+        if movies or stale:
+
+            logger.info(
+                f"Pushing {len(movies)} cards to member {member_id} in room {room}"
+            )
+            socketio.emit(
+                "cards",
+                {"add": movies, "remove": stale},
+                to=member_channel(room, member_id),
+            )
 
 
 def generate_code(rooms, length=6):
@@ -324,8 +422,6 @@ def generate_code(rooms, length=6):
 @app.route("/", methods=["GET", "POST"])
 def index():
 
-    rooms = load_rooms()
-
     session.clear()
 
     error = request.args.get("error")
@@ -353,24 +449,25 @@ def index():
 
         if "create" in request.form:
 
-            room = generate_code(rooms)
+            room = generate_code(room_store)
 
             if "member_id" not in session:
                 session["member_id"] = str(uuid.uuid4())
 
             member_id = session["member_id"]
 
-            rooms[room] = {
-                "members": {member_id: default_member_rooms(name, is_host=True)},
-                "host": member_id,
-                "chat_started": False,
-                "data": [],
-                "mutual_likes": {},
-            }
-
-            update_rooms(rooms)
+            room_store.create(
+                room,
+                {
+                    "members": {member_id: default_member_rooms(name, is_host=True)},
+                    "host": member_id,
+                    "chat_started": False,
+                    "data": [],
+                    "mutual_likes": {},
+                },
+            )
 
-        elif code not in rooms:
+        elif code not in room_store:
             return redirect(url_for("index", error="Room does not exist.", name=name))
 
         session["room"] = room
@@ -378,27 +475,30 @@ def index():
         if "member_id" not in session:
             session["member_id"] = str(uuid.uuid4())
 
-        if (
-            "join" in request.form
-            and code in rooms
-            and session["member_id"] not in rooms[code]["members"]
-        ):
+        with room_store.transaction(code) as room_data:
 
-            if rooms[code].get("chat_started", False):
+            if (
+                "join" in request.form
+                and room_data is not None
+                and session["member_id"] not in room_data["members"]
+            ):
 
-                return redirect(
-                    url_for(
-                        "index",
-                        error="This room has already started. You cannot join.",
-                        name=name,
-                    )
-                )
+                if room_data.get("chat_started", False):
 
-            rooms[code]["members"][session["member_id"]] = default_member_rooms(
-                session["name"]
-            )
+                    return redirect(
+                        url_for(
+                            "index",
+                            error="This room has already started. You cannot join.",
+                            name=name,
+                        )
+                    )
 
-            update_rooms(rooms)
+                room_store.apply(
+                    code,
+                    "join",
+                    member=session["member_id"],
+                    data=default_member_rooms(session["name"]),
+                )
 
         return redirect(url_for("room", code=room))
 
@@ -416,8 +516,6 @@ def clear_sesh(return_file="index"):
 @app.route("/prompt_name", methods=["GET", "POST"])
 def prompt_name():
 
-    rooms = load_rooms()
-
     if "room" not in session:
 
         return redirect(url_for("index"))
@@ -440,16 +538,22 @@ def prompt_name():
         if "member_id" not in session:
             session["member_id"] = str(uuid.uuid4())
 
-        if room in rooms:
+        with room_store.transaction(room) as room_data:
+
+            if room_data is not None:
 
-            if rooms[room].get("chat_started", False):
+                if room_data.get("chat_started", False):
 
-                session.clear()
+                    session.clear()
 
-                return redirect(url_for("index"))
+                    return redirect(url_for("index"))
 
-            rooms[room]["members"][session["member_id"]] = default_member_rooms(name)
-            update_rooms(rooms)
+                room_store.apply(
+                    room,
+                    "join",
+                    member=session["member_id"],
+                    data=default_member_rooms(name),
+                )
 
         return redirect(url_for("room", code=room))
 
@@ -459,8 +563,6 @@ def prompt_name():
 @app.route("/room/<code>")
 def room(code):
 
-    rooms = load_rooms()
-
     try:
 
         current_room = session["room"]
@@ -478,179 +580,183 @@ def room(code):
 
         return redirect(url_for("prompt_name"))
 
-    if code not in rooms:
+    with room_store.transaction(code) as room_data:
+
+        if room_data is None:
+
+            return redirect(url_for("index", error="Room does not exist."))
+
+        messages = list(room_data["data"])
+        room_data = snapshot_room(room_data)
 
-        return redirect(url_for("index", error="Room does not exist."))
     member_id = session.get("member_id")
 
-    if member_id not in rooms[code]["members"] and rooms[code].get(
+    if member_id not in room_data["members"] and room_data.get(
         "chat_started", False
     ):
         return redirect(
             url_for("index", error="This room has already started. You cannot join.")
         )
 
-    is_host = rooms[code]["host"] == member_id
-    chat_started = rooms[code].get("chat_started", False)
+    is_host = room_data["host"] == member_id
+    chat_started = room_data.get("chat_started", False)
 
     personalized_feed = []
 
     if chat_started:
 
-        user_survey = rooms[code]["members"][member_id].get("survey", {})
-        min_rating = None
-
-        if isinstance(user_survey, dict):
-
-            min_rating = user_survey.get("min_rating")
-
-        personalized_feed = get_initial_random_feed(min_rating=min_rating)
+        personalized_feed = get_initial_random_feed(
+            room_data, member_id, min_rating=member_min_rating(room_data, member_id)
+        )
+        card_queues.reset(code, member_id, [movie["id"] for movie in personalized_feed])
 
     return render_template(
         "room.html",
         code=code,
         base_url=base_url,
-        messages=rooms[code]["data"],
+        messages=messages,
         is_host=is_host,
         chat_started=chat_started,
         movies=personalized_feed,
     )
 
 
+@app.route("/stats")
+def stats():
+
+    import movies.ai as movies_ai
+
+    return jsonify(
+        {
+            **room_store.stats(),
+            "sweeper": room_sweeper.stats(),
+            "omdb_cache": movie_scraper.cache.stats(),
+            "votes": room_votes.stats(),
+            "tallies": room_tallies.stats(),
+            "preferences": movie_scraper.preferences.stats(),
+            "feeds": feed_cache.stats(),
+            "colike": colike_model.stats(),
+            "cards": card_queues.stats(),
+            "http": client_stats(),
+            "coalesced": {
+                "omdb": movie_scraper.flights.stats(),
+                "llm": movies_ai.suggestion_flights.stats(),
+            },
+        }
+    )
+
+
 @socketio.on("movie_choice")
 def movie_choice(data):
-    rooms = load_rooms()
     room = session.get("room")
     member_id = session.get("member_id")
 
-    if room not in rooms:
-        logger.warning(f"Movie choice from unknown room: {room}")
-        return
-
     movie_id = data.get("movie_id")
     choice = data.get("choice")
 
-    logger.info(
-        f"Member {member_id} in room {room} chose {choice} for movie {movie_id}"
-    )
+    with room_store.transaction(room) as room_data:
 
-    if movie_id and choice in ["like", "dislike"]:
-        rooms[room]["members"][member_id]["movie_choices"][movie_id] = choice
-
-        if "mutual_likes" not in rooms[room]:
-
-            rooms[room]["mutual_likes"] = {}
-
-        if choice == "like":
-
-            if movie_id not in rooms[room]["mutual_likes"]:
-
-                rooms[room]["mutual_likes"][movie_id] = []
-
-            if member_id not in rooms[room]["mutual_likes"][movie_id]:
+        if room_data is None:
+            logger.warning(f"Movie choice from unknown room: {room}")
+            return
 
-                rooms[room]["mutual_likes"][movie_id].append(member_id)
+        logger.info(
+            f"Member {member_id} in room {room} chose {choice} for movie {movie_id}"
+        )
 
-        elif choice == "dislike":
+        if not movie_id or choice not in ["like", "dislike"]:
+            return
 
-            if movie_id in rooms[room]["mutual_likes"]:
+        if movie_id not in movie_scraper.index:
+            logger.warning(f"Movie choice for unknown movie {movie_id} in {room}")
+            return
 
-                if member_id in rooms[room]["mutual_likes"][movie_id]:
+        if member_id not in room_data["members"]:
+            logger.warning(f"Movie choice from unknown member {member_id} in {room}")
+            return
 
-                    rooms[room]["mutual_likes"][movie_id].remove(member_id)
+        room_store.apply(
+            room, "vote", member=member_id, movie=movie_id, choice=choice
+        )
 
-                if not rooms[room]["mutual_likes"][movie_id]:
-                    del rooms[room]["mutual_likes"][movie_id]
+        member_choices = len(room_data["members"][member_id]["movie_choices"])
+        logger.info(f"Member {member_id} has made {member_choices} choices")
 
-        update_rooms(rooms)
+        tally = room_tallies.tally(room, room_data)
+        just_completed = tally.complete() and not room_data.get(
+            "voting_complete", False
+        )
 
-        member_choices = len(rooms[room]["members"][member_id]["movie_choices"])
-        logger.info(f"Member {member_id} has made {member_choices} choices")
+        if just_completed:
+            top_movies = tally.top(3)
+            room_store.apply(room, "done")
+        else:
+            min_votes = tally.min_votes
 
-        is_complete, top_movies = check_voting_complete(rooms[room])
+    if just_completed:
 
-        if is_complete and not rooms[room].get("voting_complete", False):
-            rooms[room]["voting_complete"] = True
-            update_rooms(rooms)
+        card_queues.discard_room(room)
+        logger.info(f"Voting complete in room {room}! Top movies: {len(top_movies)}")
 
-            logger.info(
-                f"Voting complete in room {room}! Top movies: {len(top_movies)}"
+        if len(top_movies) == 0:
+            logger.warning(f"No mutual likes found in room {room}")
+            emit(
+                "voting_complete",
+                {
+                    "top_movies": [],
+                    "message": "Sorry we can't find a movie for you",
+                },
+                to=room,
+                broadcast=True,
             )
-
-            if len(top_movies) == 0:
-                logger.warning(f"No mutual likes found in room {room}")
-                emit(
-                    "voting_complete",
-                    {
-                        "top_movies": [],
-                        "message": "Sorry we can't find a movie for you",
-                    },
-                    to=room,
-                    broadcast=True,
-                )
-            else:
-                movie_details = []
-                for movie_info in top_movies:
-                    movie_id = movie_info["movie_id"]
-                    found = False
-                    for idx, row in movie_scraper.df.iterrows():
-                        if str(idx) == movie_id or str(row.get("id", "")) == str(
-                            movie_id
-                        ):
-                            movie_details.append(
-                                {
-                                    "title": row["Title"],
-                                    "year": str(row["Year"]),
-                                    "rating": float(row["Rating"]),
-                                    "likes": movie_info["likes"],
-                                }
-                            )
-                            found = True
-                            break
-
-                logger.info(f"Emitting {len(movie_details)} top movies to room {room}")
-                emit(
-                    "voting_complete",
-                    {"top_movies": movie_details},
-                    to=room,
-                    broadcast=True,
-                )
         else:
-            min_votes = min(
-                len(member["movie_choices"])
-                for member in rooms[room]["members"].values()
+            movie_details = []
+            for movie_info in top_movies:
+                record = movie_scraper.index.record(movie_info["movie_id"])
+                if record is not None:
+                    movie_details.append(
+                        {
+                            "title": record["title"],
+                            "year": record["year"],
+                            "rating": record["rating"],
+                            "likes": movie_info["likes"],
+                        }
+                    )
+
+            logger.info(f"Emitting {len(movie_details)} top movies to room {room}")
+            emit(
+                "voting_complete",
+                {"top_movies": movie_details},
+                to=room,
+                broadcast=True,
             )
-            logger.info(f"Room {room} min_votes: {min_votes}")
-            if min_votes >= 10:
-                logger.info(f"Requesting feed update for room {room}")
-                emit(
-                    "feed_update", {"member_id": member_id}, to=room, include_self=False
-                )
+    else:
+
+        logger.info(f"Room {room} min_votes: {min_votes}")
+
+        card_queues.voted(room, member_id, movie_id)
+        socketio.start_background_task(top_up_cards, room)
 
 
 @socketio.on("get_updated_feed")
 def get_updated_feed():
 
-    rooms = load_rooms()
     room = session.get("room")
     member_id = session.get("member_id")
 
-    if room not in rooms:
-        logger.warning(f"get_updated_feed: Room {room} not found")
-        return
+    with room_store.transaction(room) as room_data:
 
-    logger.info(f"Getting updated feed for member {member_id} in room {room}")
+        if room_data is None:
+            logger.warning(f"get_updated_feed: Room {room} not found")
+            return
 
-    user_survey = rooms[room]["members"][member_id].get("survey", {})
-    min_rating = None
+        room_data = snapshot_room(room_data)
 
-    if isinstance(user_survey, dict):
+    logger.info(f"Getting updated feed for member {member_id} in room {room}")
 
-        min_rating = user_survey.get("min_rating")
+    personalized_feed = cached_feed(room, room_data, member_id)
 
-    personalized_feed = calculate_personalized_feed(
-        rooms[room], member_id, min_rating=min_rating
-    )
+    card_queues.add(room, member_id, [movie["id"] for movie in personalized_feed])
 
     logger.info(f"Sending {len(personalized_feed)} movies to member {member_id}")
     emit("updated_feed", {"movies": personalized_feed})
@@ -659,23 +765,24 @@ def get_updated_feed():
 @socketio.on("message")
 def message(data):
 
-    rooms = load_rooms()
-
     room = session.get("room")
 
     if data.get("data").startswith("survey"):
         return
 
-    if room not in rooms:
-        return
+    content = {"name": session.get("name"), "message": data["data"]}
 
-    if not rooms[room].get("chat_started", False):
-        return
+    with room_store.transaction(room) as room_data:
+
+        if room_data is None:
+            return
+
+        if not room_data.get("chat_started", False):
+            return
+
+        room_store.apply(room, "msg", data=content)
 
-    content = {"name": session.get("name"), "message": data["data"]}
     send(content, to=room)
-    rooms[room]["data"].append(content)
-    update_rooms(rooms)
 
 
 @socketio.on("survey")
@@ -685,38 +792,44 @@ def survey(data):
 
     llm_cli = movies_ai.llm()
 
-    rooms = load_rooms()
     room = session.get("room")
     member_id = session.get("member_id")
+    room_data = room_store.get(room)
 
     logger.info(f"Survey received from member {member_id} in room {room}")
 
-    if room not in rooms:
+    if room_data is None:
         logger.warning(f"Survey: Room {room} not found")
         return
 
-    if member_id not in rooms[room]["members"]:
+    if member_id not in room_data["members"]:
         logger.warning(f"Survey: Member {member_id} not in room {room}")
         return
 
-    rooms[room]["members"][member_id]["survey"] = data["data"]
+    room_store.apply(room, "survey", member=member_id, data=data["data"])
     logger.info(f"Survey saved for member {member_id}")
 
     try:
 
-        rooms[room]["members"][member_id]["suggested_from_llm"] = (
-            llm_cli.suggest_titles_based_on_preferences(data["data"]["preferences"])
+        suggested_titles = llm_cli.suggest_titles_based_on_preferences(
+            data["data"]["preferences"]
         )
         logger.info(f"LLM suggestions generated for member {member_id}")
 
     except Exception as e:
 
         logger.error(f"Error getting LLM suggestions: {e}")
-        rooms[room]["members"][member_id]["suggested_from_llm"] = []
+        suggested_titles = []
 
-    update_rooms(rooms)
+    with room_store.transaction(room) as room_data:
+
+        if room_data is None:
+            logger.warning(f"Survey: Room {room} closed before suggestions were saved")
+            return
+
+        room_store.apply(room, "suggest", member=member_id, data=suggested_titles)
+        check_surveys = check_all_surveys_complete(room_data)
 
-    check_surveys = check_all_surveys_complete(rooms[room])
     logger.info(f"Survey status for room {room}: {check_surveys}")
 
     emit(
@@ -728,13 +841,15 @@ def survey(data):
 
 @socketio.on("check_all_surveys_complete")
 def handle_check_surveys():
-    rooms = load_rooms()
     room = session.get("room")
 
-    if room not in rooms:
-        return
+    with room_store.transaction(room) as room_data:
+
+        if room_data is None:
+            return
+
+        check_surveys = check_all_surveys_complete(room_data)
 
-    check_surveys = check_all_surveys_complete(rooms[room])
     emit("all_surveys_complete", check_surveys, to=room, broadcast=True)
 
 
@@ -757,22 +872,27 @@ def check_all_surveys_complete(room_data):
 @socketio.on("start_chat")
 def start_chat():
 
-    rooms = load_rooms()
     room = session.get("room")
     member_id = session.get("member_id")
 
     logger.info(f"Start chat requested by member {member_id} in room {room}")
 
-    if room not in rooms:
-        logger.warning(f"Start chat: Room {room} not found")
-        return
+    with room_store.transaction(room) as room_data:
 
-    if rooms[room]["host"] != member_id:
-        logger.warning(f"Start chat: Member {member_id} is not host")
-        return
+        if room_data is None:
+            logger.warning(f"Start chat: Room {room} not found")
+            return
+
+        if room_data["host"] != member_id:
+            logger.warning(f"Start chat: Member {member_id} is not host")
+            return
 
-    check_surveys = check_all_surveys_complete(rooms[room])
-    logger.info(f"Survey check before starting: {check_surveys}")
+        check_surveys = check_all_surveys_complete(room_data)
+        logger.info(f"Survey check before starting: {check_surveys}")
+
+        if check_surveys["ready"]:
+            logger.info(f"Starting chat in room {room}")
+            room_store.apply(room, "start")
 
     if not check_surveys["ready"]:
 
@@ -785,19 +905,15 @@ def start_chat():
         )
         return
 
-    logger.info(f"Starting chat in room {room}")
-    rooms[room]["chat_started"] = True
-    update_rooms(rooms)
     emit("chat_started", to=room, broadcast=True)
 
 
 @socketio.on("connect")
 def connect(auth):
 
-    rooms = load_rooms()
-
     room = session.get("room")
     name = session.get("name")
+    room_data = room_store.get(room)
 
     logger.info(
         f"Socket connect: room={room}, name={name}, member_id={session.get('member_id')}"
@@ -807,11 +923,14 @@ def connect(auth):
         logger.warning("Connect: No room or name in session")
         return
 
+    join_room(member_channel(room, session.get("member_id")))
+    card_queues.connect(room, session.get("member_id"))
+
     try:
 
         if (
-            len(rooms[room]["members"].keys()) == 1
-            and session.get("member_id") in rooms[room]["members"].keys()
+            len(room_data["members"].keys()) == 1
+            and session.get("member_id") in room_data["members"].keys()
         ):
 
             join_room(room)
@@ -819,7 +938,7 @@ def connect(auth):
             logger.info(f"Host {name} joined room {room}")
 
             return
-        if room not in rooms:
+        if room_data is None:
             leave_room(room)
             logger.warning(f"Room {room} does not exist")
             return
@@ -837,36 +956,34 @@ def connect(auth):
 
     try:
 
-        if member_id and member_id not in rooms[room]["members"]:
-            if rooms[room].get("chat_started", False):
-                logger.warning(f"Member {member_id} tried to join started room {room}")
-                return
-            rooms[room]["members"][member_id] = default_member_rooms(name)
-            logger.info(f"Added member {member_id} to room {room}")
+        with room_store.transaction(room) as room_data:
+
+            if member_id and member_id not in room_data["members"]:
+                if room_data.get("chat_started", False):
+                    logger.warning(
+                        f"Member {member_id} tried to join started room {room}"
+                    )
+                    return
+                room_store.apply(
+                    room, "join", member=member_id, data=default_member_rooms(name)
+                )
+                logger.info(f"Added member {member_id} to room {room}")
 
     except Exception as e:
 
         logger.error(f"Error adding member to room: {e}")
         pass
 
-    update_rooms(rooms)
-
 
 @socketio.on("disconnect")
 def disconnect():
 
-    rooms = load_rooms()
-
     room = session.get("room")
     name = session.get("name")
     leave_room(room)
-
-    if room in rooms:
-
-        pass
+    card_queues.disconnect(room, session.get("member_id"))
 
     send({"name": name, "message": "has left the room"}, to=room)
-    update_rooms(rooms)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
-import requests
+import re
+from movies.client import shared_client
+from movies.flight import SingleFlight
 from pathlib import Path
 from dotenv import load_dotenv
 import os
 import pandas as pd
 
+suggestion_flights = SingleFlight()
+
+
 class llm:
 
     def __init__(self, api_key="use_local"):
@@ -21,6 +26,12 @@ class llm:
         
             self.api_key = api_key
 
+        self.http = shared_client(
+            "llm",
+            timeout=float(os.getenv("AI_TIMEOUT", "60")),
+            retries=int(os.getenv("AI_RETRIES", "1")),
+        )
+
     def make_request(self, user_prompt, system_prompt=None, model="google/gemini-2.5-flash",max_tokens=8000):
 
         headers = {
@@ -41,12 +52,20 @@ class llm:
             "max_tokens": max_tokens,
         }
 
-        response = requests.post(self.base_url, headers=headers, json=body)
+        response = self.http.post(
+            self.base_url, endpoint="chat", headers=headers, json=body
+        )
         
         return response.json()
 
     def suggest_titles_based_on_preferences(self, preferences):
 
+        key = re.sub(r"\s+", " ", str(preferences)).strip().casefold()
+
+        return suggestion_flights.do(key, self._suggest_titles, preferences)
+
+    def _suggest_titles(self, preferences):
+
         self.movie_path = Path(__file__).parent / "results" / "movies.csv"
 
         self.df = pd.read_csv(self.movie_path)
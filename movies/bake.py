@@ -0,0 +1,129 @@
+import argparse
+import csv
+from pathlib import Path
+import pandas as pd
+from movies.catalog import movie_id, write_catalog
+from movies.scrape import scraper
+
+
+def bake(output, deadline=600.0):
+
+    movie_scraper = scraper(api_key="use_local", use_catalog=False)
+    df = movie_scraper.df
+
+    details = movie_scraper.enrich_many(
+        list(zip(df["Title"], df["Year"])), deadline=deadline
+    )
+
+    movies = []
+
+    for (title, year, rating), more_movie_info in zip(
+        zip(df["Title"], df["Year"], df["Rating"]), details
+    ):
+
+        movies.append(
+            {
+                "title": title,
+                "year": year,
+                "rating": rating,
+                "poster": more_movie_info.get("poster", "N/A"),
+                "plot": more_movie_info.get("plot", "No description available."),
+                "genre": more_movie_info.get("genre", "N/A"),
+                "director": more_movie_info.get("director", "N/A"),
+                "actors": more_movie_info.get("actors", "N/A"),
+            }
+        )
+
+    missing = sum(1 for movie in movies if movie["genre"] == "N/A")
+
+    return write_catalog(output, movies), missing
+
+
+def bake_imdb(basics_path, ratings_path, output, min_votes=0):
+
+    ratings = pd.read_csv(
+        ratings_path,
+        sep="\t",
+        na_values="\\N",
+        dtype={"tconst": str, "averageRating": float, "numVotes": "Int64"},
+    )
+    ratings = ratings[ratings["numVotes"] >= min_votes].set_index("tconst")
+
+    chunks = []
+
+    for chunk in pd.read_csv(
+        basics_path,
+        sep="\t",
+        na_values="\\N",
+        quoting=csv.QUOTE_NONE,
+        usecols=["tconst", "titleType", "primaryTitle", "startYear", "genres"],
+        dtype=str,
+        chunksize=500_000,
+    ):
+
+        chunk = chunk[(chunk["titleType"] == "movie") & chunk["startYear"].notna()]
+        chunks.append(chunk.join(ratings, on="tconst", how="inner"))
+
+    df = pd.concat(chunks).sort_values("numVotes", ascending=False)
+    df["id"] = [
+        movie_id(title, int(year))
+        for title, year in zip(df["primaryTitle"], df["startYear"])
+    ]
+    df = df.drop_duplicates("id")
+
+    movies = [
+        {
+            "title": title,
+            "year": int(year),
+            "rating": rating,
+            "poster": "N/A",
+            "plot": "No description available.",
+            "genre": genres.replace(",", ", ") if isinstance(genres, str) else "N/A",
+            "director": "N/A",
+            "actors": "N/A",
+        }
+        for title, year, rating, genres in zip(
+            df["primaryTitle"], df["startYear"], df["averageRating"], df["genres"]
+        )
+    ]
+
+    return write_catalog(output, movies)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Enrich movies.csv from OMDB once and write the columnar catalog"
+    )
+    parser.add_argument(
+        "--output", default=Path(__file__).parent / "results" / "catalog"
+    )
+    parser.add_argument("--deadline", type=float, default=600.0)
+    parser.add_argument(
+        "--imdb",
+        help="Directory with IMDb's title.basics.tsv.gz and title.ratings.tsv.gz; "
+        "bakes every rated movie from them instead of enriching movies.csv",
+    )
+    parser.add_argument("--min-votes", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.imdb:
+
+        imdb = Path(args.imdb)
+        rows = bake_imdb(
+            imdb / "title.basics.tsv.gz",
+            imdb / "title.ratings.tsv.gz",
+            args.output,
+            min_votes=args.min_votes,
+        )
+        print(f"Baked {rows} IMDb movies into {args.output}")
+
+        return
+
+    rows, missing = bake(args.output, deadline=args.deadline)
+
+    print(f"Baked {rows} movies into {args.output} ({missing} without OMDB details)")
+
+
+if __name__ == "__main__":
+    main()
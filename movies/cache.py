@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key(title, year=None):
+
+    title = re.sub(r"\s+", " ", str(title)).strip().casefold()
+    year = str(year).strip() if year not in (None, "") else ""
+
+    return f"{title}|{year}"
+
+
+class MetadataCache:
+
+    def __init__(self, path, ttl=30 * 86400, negative_ttl=86400):
+
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS omdb_cache ("
+            "key TEXT PRIMARY KEY, details TEXT, fetched INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def _conn(self):
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or self._local.pid != os.getpid():
+
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def _count(self, counter):
+
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, title, year=None):
+
+        row = (
+            self._conn()
+            .execute(
+                "SELECT details, fetched FROM omdb_cache WHERE key = ?",
+                (normalize_key(title, year),),
+            )
+            .fetchone()
+        )
+
+        if row is None:
+
+            self._count("misses")
+
+            return False, None
+
+        details, fetched = row
+        ttl = self.ttl if details is not None else self.negative_ttl
+
+        if time.time() - fetched > ttl:
+
+            self._count("expired")
+            self._count("misses")
+
+            return False, None
+
+        if details is None:
+
+            self._count("negative_hits")
+
+            return True, None
+
+        self._count("hits")
+
+        return True, json.loads(details)
+
+    def put(self, title, year, details):
+
+        self._conn().execute(
+            "INSERT OR REPLACE INTO omdb_cache (key, details, fetched) VALUES (?, ?, ?)",
+            (
+                normalize_key(title, year),
+                json.dumps(details) if details is not None else None,
+                int(time.time()),
+            ),
+        )
+        self._count("stores")
+
+    def stats(self):
+
+        with self._stats_lock:
+
+            lookups = self.hits + self.negative_hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stores": self.stores,
+                "hit_rate": round(
+                    (self.hits + self.negative_hits) / lookups if lookups else 0, 4
+                ),
+            }
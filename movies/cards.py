@@ -0,0 +1,136 @@
+import threading
+
+
+class CardQueues:
+
+    def __init__(self, depth=10, low_water=None):
+
+        self.depth = depth
+        self.low_water = depth // 2 if low_water is None else low_water
+
+        self.top_ups = 0
+        self.pushed = 0
+        self.removed = 0
+
+        self._queues = {}
+        self._pending = set()
+        self._connected = {}
+        self._lock = threading.Lock()
+
+    def connect(self, room, member_id):
+
+        with self._lock:
+
+            key = (room, member_id)
+            self._connected[key] = self._connected.get(key, 0) + 1
+
+    def disconnect(self, room, member_id):
+
+        with self._lock:
+
+            key = (room, member_id)
+            count = self._connected.get(key, 0) - 1
+
+            if count > 0:
+                self._connected[key] = count
+            else:
+                self._connected.pop(key, None)
+
+    def connected(self, room, member_id):
+
+        with self._lock:
+            return (room, member_id) in self._connected
+
+    def reset(self, room, member_id, movie_ids):
+
+        with self._lock:
+            self._queues[(room, member_id)] = list(dict.fromkeys(movie_ids))
+
+    def queued(self, room, member_id):
+
+        with self._lock:
+            return tuple(self._queues.get((room, member_id), ()))
+
+    def voted(self, room, member_id, movie_id):
+
+        with self._lock:
+
+            queue = self._queues.get((room, member_id))
+
+            if queue is not None and movie_id in queue:
+                queue.remove(movie_id)
+
+    def claim(self, room, member_id):
+
+        key = (room, member_id)
+
+        with self._lock:
+
+            if key in self._pending:
+                return 0
+
+            wanted = self.depth - len(self._queues.get(key, ()))
+
+            if len(self._queues.get(key, ())) > self.low_water or wanted <= 0:
+                return 0
+
+            self._pending.add(key)
+
+            return wanted
+
+    def add(self, room, member_id, movie_ids):
+
+        with self._lock:
+
+            queue = self._queues.setdefault((room, member_id), [])
+            added = [movie_id for movie_id in movie_ids if movie_id not in queue]
+            queue.extend(added)
+
+            self.pushed += len(added)
+
+            return added
+
+    def remove(self, room, member_id, movie_ids):
+
+        with self._lock:
+
+            queue = self._queues.get((room, member_id), [])
+            removed = [movie_id for movie_id in movie_ids if movie_id in queue]
+
+            for movie_id in removed:
+                queue.remove(movie_id)
+
+            self.removed += len(removed)
+
+            return removed
+
+    def release(self, room, member_id):
+
+        with self._lock:
+
+            self._pending.discard((room, member_id))
+            self.top_ups += 1
+
+    def discard_room(self, room):
+
+        with self._lock:
+
+            for key in [key for key in self._queues if key[0] == room]:
+                del self._queues[key]
+
+            for key in [key for key in self._connected if key[0] == room]:
+                del self._connected[key]
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "queues": len(self._queues),
+                "connected": len(self._connected),
+                "depth": self.depth,
+                "top_ups": self.top_ups,
+                "cards_pushed": self.pushed,
+                "cards_removed": self.removed,
+                "topping_up": len(self._pending),
+            }
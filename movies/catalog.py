@@ -0,0 +1,177 @@
+import csv
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+import numpy as np
+from movies.cache import normalize_key
+from movies.columns import StringColumn, encode_strings
+from movies.content import build_matrix, movie_features
+from movies.index import index_columns
+from movies.preferences import build_postings
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 2
+
+TEXT_COLUMNS = ("title", "poster", "plot", "genre", "director", "actors")
+
+
+def movie_id(title, year):
+
+    digest = hashlib.blake2b(
+        normalize_key(title, year).encode("utf-8"), digest_size=8
+    ).digest()
+
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+
+def legacy_ids(csv_path):
+
+    csv_path = Path(csv_path)
+
+    if not csv_path.exists():
+        return {}
+
+    with open(csv_path, newline="") as f:
+
+        return {
+            str(row): str(movie_id(movie["Title"], movie["Year"]))
+            for row, movie in enumerate(csv.DictReader(f))
+        }
+
+
+def split_genres(genre):
+
+    if not genre or genre == "N/A":
+        return []
+
+    return [part.strip() for part in str(genre).split(",") if part.strip()]
+
+
+def encode_genres(genres_per_movie):
+
+    vocabulary = sorted({genre for genres in genres_per_movie for genre in genres})
+
+    if len(vocabulary) > 64:
+        raise ValueError(f"{len(vocabulary)} genres do not fit a 64-bit genre mask")
+
+    positions = {genre: i for i, genre in enumerate(vocabulary)}
+    codes = np.zeros(len(genres_per_movie), dtype=np.uint64)
+
+    for row, genres in enumerate(genres_per_movie):
+
+        for genre in genres:
+            codes[row] |= np.uint64(1) << np.uint64(positions[genre])
+
+    return np.array(vocabulary, dtype=str), codes
+
+
+def write_catalog(path, movies):
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    ids = np.array([movie_id(m["title"], m["year"]) for m in movies], dtype=np.int64)
+
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Duplicate title/year pairs produce colliding movie ids")
+
+    order = np.argsort(ids)
+    movies = [movies[row] for row in order]
+
+    genres, genre_mask = encode_genres([split_genres(m["genre"]) for m in movies])
+
+    columns = index_columns(
+        ids[order],
+        [m["title"] for m in movies],
+        [int(m["year"]) for m in movies],
+        [float(m["rating"]) for m in movies],
+    )
+    columns["genre_mask"] = genre_mask
+    columns["genres"] = genres
+
+    for column in TEXT_COLUMNS:
+
+        if column == "title":
+            continue
+
+        encoded = encode_strings(str(m[column]) for m in movies)
+
+        for part, values in encoded.items():
+            columns[f"{column}_{part}"] = values
+
+    columns.update(
+        build_matrix(
+            movie_features(m["plot"], m["genre"], m["director"], m["actors"])
+            for m in movies
+        )
+    )
+    columns.update(
+        build_postings(
+            f"{m['genre']} {m['actors']} {m['director']}" for m in movies
+        )
+    )
+
+    for column, values in columns.items():
+        np.save(path / f"{column}.npy", values, allow_pickle=False)
+
+    with open(path / "meta.json", "w") as f:
+        json.dump(
+            {
+                "version": CATALOG_VERSION,
+                "rows": len(movies),
+                "columns": sorted(columns),
+                "text_columns": list(TEXT_COLUMNS),
+                "baked_at": int(time.time()),
+            },
+            f,
+            indent=4,
+        )
+
+    return len(movies)
+
+
+def read_catalog(path, mmap=True):
+
+    path = Path(path)
+    meta_path = path / "meta.json"
+
+    if not meta_path.exists():
+        return None
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if meta.get("version") != CATALOG_VERSION:
+
+        logger.warning(
+            f"Ignoring catalog at {path} with version {meta.get('version')}, "
+            f"expected {CATALOG_VERSION}; run python -m movies.bake again"
+        )
+
+        return None
+
+    started = time.perf_counter()
+    columns = {
+        column: np.load(
+            path / f"{column}.npy", mmap_mode="r" if mmap else None, allow_pickle=False
+        )
+        for column in meta["columns"]
+    }
+
+    for column in meta["text_columns"]:
+
+        columns[column] = StringColumn(
+            columns[f"{column}_codes"],
+            columns[f"{column}_offsets"],
+            columns[f"{column}_heap"],
+        )
+
+    logger.info(
+        f"{'Mapped' if mmap else 'Loaded'} {meta['rows']} baked movies from {path} in "
+        f"{(time.perf_counter() - started) * 1000:.1f}ms"
+    )
+
+    return columns
@@ -0,0 +1,277 @@
+import bisect
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LatencyHistogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, elapsed_ms, failed=False):
+
+        self.counts[bisect.bisect_left(self.buckets, elapsed_ms)] += 1
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+
+        if failed:
+            self.errors += 1
+
+    def stats(self):
+
+        count = sum(self.counts)
+        labels = [f"le_{bound}ms" for bound in self.buckets] + ["inf"]
+
+        return {
+            "count": count,
+            "errors": self.errors,
+            "mean_ms": round(self.total / count, 2) if count else 0,
+            "max_ms": round(self.max, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+
+        if self.opened_at is None:
+            return "closed"
+
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+
+        return "open"
+
+    def allow(self):
+
+        with self._lock:
+
+            state = self.state
+
+            if state == "closed":
+                return True
+
+            if state == "half-open" and not self._probing:
+
+                self._probing = True
+
+                return True
+
+            self.rejected += 1
+
+            return False
+
+    def record_success(self):
+
+        with self._lock:
+
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+
+        with self._lock:
+
+            self.failures += 1
+
+            if self._probing:
+
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+            elif self.opened_at is None and self.failures >= self.failure_threshold:
+
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+                logger.warning(
+                    f"Circuit opened after {self.failures} consecutive failures, "
+                    f"failing fast for {self.reset_after}s"
+                )
+
+    def stats(self):
+
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class HttpClient:
+
+    def __init__(
+        self,
+        name,
+        timeout=5.0,
+        retries=2,
+        backoff=0.2,
+        backoff_max=2.0,
+        pool_size=16,
+        failure_threshold=5,
+        reset_after=30.0,
+    ):
+
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self.retried = 0
+        self.latencies = {}
+
+        self._lock = threading.Lock()
+
+    def _observe(self, endpoint, elapsed_ms, failed):
+
+        with self._lock:
+            self.latencies.setdefault(endpoint, LatencyHistogram()).observe(
+                elapsed_ms, failed
+            )
+
+    def _sleep(self, attempt):
+
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt)))
+
+    def request(self, method, url, endpoint=None, **kwargs):
+
+        endpoint = endpoint or url
+        kwargs.setdefault("timeout", self.timeout)
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        for attempt in range(self.retries + 1):
+
+            started = time.perf_counter()
+
+            try:
+
+                response = self.session.request(method, url, **kwargs)
+                failed = response.status_code in RETRY_STATUSES
+
+            except requests.exceptions.RequestException:
+
+                self._observe(endpoint, (time.perf_counter() - started) * 1000, True)
+
+                if attempt == self.retries:
+
+                    self.breaker.record_failure()
+                    raise
+
+                failed = True
+                response = None
+
+            else:
+
+                self._observe(endpoint, (time.perf_counter() - started) * 1000, failed)
+
+                if not failed or attempt == self.retries:
+                    break
+
+            self.retried += 1
+            logger.info(
+                f"{self.name} request to {endpoint} failed, retrying "
+                f"({attempt + 1}/{self.retries})"
+            )
+            self._sleep(attempt)
+
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        return response
+
+    def get(self, url, endpoint=None, **kwargs):
+
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint=None, **kwargs):
+
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def stats(self):
+
+        with self._lock:
+            latencies = {
+                endpoint: histogram.stats()
+                for endpoint, histogram in self.latencies.items()
+            }
+
+        return {
+            "breaker": self.breaker.stats(),
+            "retried": self.retried,
+            "endpoints": latencies,
+        }
+
+    def close(self):
+
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(name, **options):
+
+    with _clients_lock:
+
+        if name not in _clients:
+            _clients[name] = HttpClient(name, **options)
+
+        return _clients[name]
+
+
+def client_stats():
+
+    with _clients_lock:
+        clients = dict(_clients)
+
+    return {name: client.stats() for name, client in clients.items()}
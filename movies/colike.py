@@ -0,0 +1,403 @@
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COLIKE_VERSION = 1
+
+MODEL_COLUMNS = ("items", "indptr", "indices", "scores")
+STATE_COLUMNS = ("liked_items", "liked_counts", "pair_a", "pair_b", "pair_counts")
+
+
+def _save(path, name, values):
+
+    tmp = path / f"{name}.tmp.npy"
+    np.save(tmp, values, allow_pickle=False)
+    os.replace(tmp, path / f"{name}.npy")
+
+
+def _load_meta(path):
+
+    meta_path = Path(path) / "meta.json"
+
+    if not meta_path.exists():
+        return None
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if meta.get("version") != COLIKE_VERSION:
+
+        logger.warning(
+            f"Ignoring co-like model at {path} with version {meta.get('version')}, "
+            f"expected {COLIKE_VERSION}"
+        )
+
+        return None
+
+    return meta
+
+
+def read_archive(archive_path, offset=0):
+
+    rooms = []
+
+    with open(archive_path, "rb") as f:
+
+        f.seek(offset)
+
+        for line in f:
+
+            if not line.endswith(b"\n"):
+                break
+
+            offset += len(line)
+
+            try:
+                rooms.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping unreadable archive line at byte {offset}")
+
+    return rooms, offset
+
+
+def parse_ids(movie_ids):
+
+    parsed = []
+
+    for movie in movie_ids:
+
+        try:
+            value = int(movie)
+        except (TypeError, ValueError):
+            continue
+
+        if 0 <= value < 1 << 63:
+            parsed.append(value)
+
+    return np.array(parsed, dtype=np.int64)
+
+
+def count_rooms(rooms):
+
+    liked = []
+    pairs = []
+
+    for room in rooms:
+
+        for likes, _ in room.get("votes", []):
+
+            items = np.unique(parse_ids(likes))
+
+            if len(items) == 0:
+                continue
+
+            liked.append(items)
+
+            if len(items) > 1:
+
+                a, b = np.triu_indices(len(items), k=1)
+                pairs.append(np.stack([items[a], items[b]], axis=1))
+
+    liked = np.concatenate(liked) if liked else np.zeros(0, dtype=np.int64)
+    pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+    return liked, pairs
+
+
+def merge_counts(items, counts, new_items):
+
+    items, inverse = np.unique(
+        np.concatenate([items, new_items]), return_inverse=True
+    )
+    merged = np.zeros(len(items), dtype=np.int64)
+    np.add.at(
+        merged, inverse, np.concatenate([counts, np.ones(len(new_items), np.int64)])
+    )
+
+    return items, merged
+
+
+def merge_pairs(pairs, counts, new_pairs):
+
+    pairs, inverse = np.unique(
+        np.concatenate([pairs, new_pairs]), axis=0, return_inverse=True
+    )
+    merged = np.zeros(len(pairs), dtype=np.int64)
+    np.add.at(
+        merged,
+        inverse.reshape(-1),
+        np.concatenate([counts, np.ones(len(new_pairs), np.int64)]),
+    )
+
+    return pairs, merged
+
+
+def build_model(liked_items, liked_counts, pairs, pair_counts, neighbours, min_support):
+
+    keep = pair_counts >= min_support
+    pairs, pair_counts = pairs[keep], pair_counts[keep]
+
+    a = np.searchsorted(liked_items, pairs[:, 0])
+    b = np.searchsorted(liked_items, pairs[:, 1])
+    scores = pair_counts / np.sqrt(liked_counts[a] * liked_counts[b])
+
+    rows = np.concatenate([a, b])
+    cols = np.concatenate([b, a])
+    scores = np.concatenate([scores, scores]).astype(np.float32)
+
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+
+    starts = np.searchsorted(rows, np.arange(len(liked_items)))
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < neighbours
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    indptr = np.zeros(len(liked_items) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(liked_items)), out=indptr[1:])
+
+    return {
+        "items": liked_items.astype(np.int64),
+        "indptr": indptr,
+        "indices": cols.astype(np.int32),
+        "scores": scores,
+    }
+
+
+def train(archive_path, output, neighbours=50, min_support=1, full=False):
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    meta = None if full else _load_meta(output)
+    offset = meta["archive_offset"] if meta else 0
+
+    if os.path.getsize(archive_path) < offset:
+
+        logger.warning(
+            f"{archive_path} shrank since the last run, retraining from scratch"
+        )
+        meta, offset = None, 0
+
+    rooms, offset = read_archive(archive_path, offset)
+
+    if meta:
+        state = {
+            column: np.load(output / f"{column}.npy", allow_pickle=False)
+            for column in STATE_COLUMNS
+        }
+    else:
+        state = {
+            "liked_items": np.zeros(0, dtype=np.int64),
+            "liked_counts": np.zeros(0, dtype=np.int64),
+            "pair_a": np.zeros(0, dtype=np.int64),
+            "pair_b": np.zeros(0, dtype=np.int64),
+            "pair_counts": np.zeros(0, dtype=np.int64),
+        }
+
+    if meta and not rooms:
+        return 0, meta["rooms"]
+
+    liked, new_pairs = count_rooms(rooms)
+    liked_items, liked_counts = merge_counts(
+        state["liked_items"], state["liked_counts"], liked
+    )
+    pairs, pair_counts = merge_pairs(
+        np.stack([state["pair_a"], state["pair_b"]], axis=1),
+        state["pair_counts"],
+        new_pairs,
+    )
+
+    model = build_model(
+        liked_items, liked_counts, pairs, pair_counts, neighbours, min_support
+    )
+
+    for column, values in {
+        "liked_items": liked_items,
+        "liked_counts": liked_counts,
+        "pair_a": pairs[:, 0],
+        "pair_b": pairs[:, 1],
+        "pair_counts": pair_counts,
+        **model,
+    }.items():
+        _save(output, column, values)
+
+    total = (meta["rooms"] if meta else 0) + len(rooms)
+    tmp = output / "meta.json.tmp"
+
+    with open(tmp, "w") as f:
+        json.dump(
+            {
+                "version": COLIKE_VERSION,
+                "rooms": total,
+                "items": len(liked_items),
+                "pairs": len(pairs),
+                "archive_offset": offset,
+                "neighbours": neighbours,
+                "min_support": min_support,
+                "trained_at": int(time.time()),
+            },
+            f,
+            indent=4,
+        )
+
+    os.replace(tmp, output / "meta.json")
+
+    return len(rooms), total
+
+
+class ColikeModel:
+
+    def __init__(self, path, positions, size, reload_interval=60.0):
+
+        self.path = Path(path)
+        self.positions = positions
+        self.size = size
+        self.reload_interval = reload_interval
+
+        self.columns = None
+        self.item_positions = None
+        self.loaded_mtime = None
+        self._checked = 0.0
+
+        self._load()
+
+    def _load(self):
+
+        meta_path = self.path / "meta.json"
+
+        try:
+            mtime = meta_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+
+        if mtime == self.loaded_mtime or _load_meta(self.path) is None:
+            return
+
+        columns = {
+            column: np.load(self.path / f"{column}.npy", mmap_mode="r")
+            for column in MODEL_COLUMNS
+        }
+
+        if len(columns["indptr"]) != len(columns["items"]) + 1 or not (
+            len(columns["indices"]) == len(columns["scores"]) == columns["indptr"][-1]
+        ):
+
+            logger.warning(f"Co-like model at {self.path} is mid-write, retrying later")
+
+            return
+
+        self.item_positions = np.array(
+            [self.positions.get(str(item), -1) for item in columns["items"]],
+            dtype=np.int64,
+        )
+        self.columns = columns
+        self.loaded_mtime = mtime
+
+        logger.info(f"Loaded co-like model for {len(columns['items'])} movies")
+
+    def _refresh(self):
+
+        now = time.monotonic()
+
+        if now - self._checked < self.reload_interval:
+            return
+
+        self._checked = now
+        self._load()
+
+    def scores(self, liked_ids):
+
+        self._refresh()
+        vector = np.zeros(self.size, dtype=np.float64)
+
+        if self.columns is None or not liked_ids:
+            return vector
+
+        items = self.columns["items"]
+        liked = parse_ids(liked_ids)
+        rows = np.searchsorted(items, liked)
+        found = rows < len(items)
+        rows = rows[found][items[rows[found]] == liked[found]]
+
+        indptr = self.columns["indptr"]
+
+        for row in rows:
+
+            start, end = indptr[row], indptr[row + 1]
+            neighbours = self.item_positions[self.columns["indices"][start:end]]
+            found = neighbours >= 0
+
+            np.add.at(
+                vector, neighbours[found], self.columns["scores"][start:end][found]
+            )
+
+        return vector
+
+    def stats(self):
+
+        return {
+            "loaded": self.columns is not None,
+            "items": len(self.columns["items"]) if self.columns is not None else 0,
+            "neighbours": (
+                len(self.columns["indices"]) if self.columns is not None else 0
+            ),
+        }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Train the item-item co-like model from archived room votes"
+    )
+    parser.add_argument(
+        "--archive",
+        default=Path(__file__).parent.parent / "data" / "rooms.archive.jsonl",
+    )
+    parser.add_argument(
+        "--output", default=Path(__file__).parent / "results" / "colike"
+    )
+    parser.add_argument("--neighbours", type=int, default=50)
+    parser.add_argument("--min-support", type=int, default=1)
+    parser.add_argument(
+        "--full", action="store_true", help="Retrain from the whole archive"
+    )
+    parser.add_argument(
+        "--every",
+        type=float,
+        default=0,
+        help="Keep running, training every N seconds",
+    )
+    args = parser.parse_args()
+
+    while True:
+
+        if os.path.exists(args.archive):
+
+            new, total = train(
+                args.archive,
+                args.output,
+                neighbours=args.neighbours,
+                min_support=args.min_support,
+                full=args.full,
+            )
+            print(f"Trained on {new} new rooms ({total} total) into {args.output}")
+
+        else:
+            print(f"No archive at {args.archive} yet")
+
+        if args.every <= 0:
+            break
+
+        args.full = False
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
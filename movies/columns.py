@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+import numpy as np
+
+
+def encode_strings(values):
+
+    values = [str(value) for value in values]
+    vocabulary = sorted(set(values), key=lambda value: (value.casefold(), value))
+    codes = {value: code for code, value in enumerate(vocabulary)}
+
+    encoded = [value.encode("utf-8") for value in vocabulary]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+    return {
+        "codes": np.fromiter(
+            (codes[value] for value in values), dtype=np.uint32, count=len(values)
+        ),
+        "offsets": offsets,
+        "heap": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+def group_rows(codes, size):
+
+    order = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[order], np.arange(size + 1))
+
+    return order.astype(np.int64), starts.astype(np.int64)
+
+
+class StringColumn:
+
+    def __init__(self, codes, offsets, heap):
+
+        self.codes = codes
+        self.offsets = offsets
+        self.heap = heap
+
+    @classmethod
+    def from_values(cls, values):
+
+        encoded = encode_strings(values)
+
+        return cls(encoded["codes"], encoded["offsets"], encoded["heap"])
+
+    def __len__(self):
+
+        return len(self.codes) if self.codes is not None else self.vocabulary_size
+
+    @property
+    def vocabulary_size(self):
+
+        return len(self.offsets) - 1
+
+    def value(self, code):
+
+        return self.heap[self.offsets[code] : self.offsets[code + 1]].tobytes().decode(
+            "utf-8"
+        )
+
+    def _code(self, row):
+
+        return row if self.codes is None else self.codes[row]
+
+    def __getitem__(self, row):
+
+        if isinstance(row, (np.ndarray, list)):
+            return [self.value(code) for code in self._code(row)]
+
+        return self.value(self._code(row))
+
+    def __iter__(self):
+
+        for row in range(len(self)):
+            yield self.value(self._code(row))
+
+    def find(self, text):
+
+        folded = str(text).casefold()
+        codes = range(self.vocabulary_size)
+
+        def key(code):
+
+            return self.value(code).casefold()
+
+        return (
+            bisect_left(codes, folded, key=key),
+            bisect_right(codes, folded, key=key),
+        )
+
+
+class IdPositions(Mapping):
+
+    def __init__(self, ids):
+
+        self.ids = ids
+
+    def __getitem__(self, movie_id):
+
+        try:
+            value = int(movie_id)
+        except (TypeError, ValueError):
+            raise KeyError(movie_id)
+
+        if str(value) != str(movie_id) or not 0 <= value < 1 << 63:
+            raise KeyError(movie_id)
+
+        position = int(np.searchsorted(self.ids, value))
+
+        if position == len(self.ids) or self.ids[position] != value:
+            raise KeyError(movie_id)
+
+        return position
+
+    def __iter__(self):
+
+        for value in self.ids:
+            yield str(value)
+
+    def __len__(self):
+
+        return len(self.ids)
@@ -0,0 +1,189 @@
+import zlib
+import numpy as np
+from movies.preferences import tokenize
+
+FEATURE_BITS = 18
+
+FIELD_WEIGHTS = {"plot": 1, "genre": 3, "director": 2, "actors": 2}
+
+CONTENT_COLUMNS = ("content_indptr", "content_indices", "content_data")
+
+FEATURE_COLUMNS = (
+    "content_feature_indptr",
+    "content_feature_rows",
+    "content_feature_data",
+)
+
+
+def features(text, weight=1):
+
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    mask = (1 << FEATURE_BITS) - 1
+
+    return [zlib.crc32(gram.encode("utf-8")) & mask for gram in grams] * weight
+
+
+def movie_features(plot, genre, director, actors):
+
+    fields = {"plot": plot, "genre": genre, "director": director, "actors": actors}
+    hashed = []
+
+    for field, text in fields.items():
+
+        if field == "plot" and text == "No description available.":
+            continue
+
+        hashed.extend(features(text, FIELD_WEIGHTS[field]))
+
+    return hashed
+
+
+def build_matrix(documents):
+
+    documents = list(documents)
+    indptr = [0]
+    indices = []
+    counts = []
+
+    for hashed in documents:
+
+        columns, tf = np.unique(np.array(hashed, dtype=np.int64), return_counts=True)
+        indices.append(columns)
+        counts.append(tf)
+        indptr.append(indptr[-1] + len(columns))
+
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+
+    df = np.bincount(indices, minlength=1 << FEATURE_BITS)
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1
+    data = (1 + np.log(counts)) * idf[indices]
+
+    rows = np.repeat(np.arange(len(documents)), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=data**2, minlength=len(documents)))
+    data = data / np.where(norms > 0, norms, 1)[rows]
+
+    matrix = {
+        "content_indptr": indptr,
+        "content_indices": indices.astype(np.int32),
+        "content_data": data.astype(np.float32),
+    }
+    matrix.update(transpose(indptr, matrix["content_indices"], matrix["content_data"]))
+
+    return matrix
+
+
+def transpose(indptr, indices, data):
+
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    feature_indptr = np.searchsorted(indices[order], np.arange((1 << FEATURE_BITS) + 1))
+
+    return {
+        "content_feature_indptr": feature_indptr.astype(np.int64),
+        "content_feature_rows": rows[order],
+        "content_feature_data": data[order],
+    }
+
+
+class ContentIndex:
+
+    def __init__(self, indptr, indices, data, features=None):
+
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.size = len(indptr) - 1
+
+        if features is None:
+            features = transpose(indptr, indices, data)
+
+        self.feature_indptr, self.feature_rows, self.feature_data = (
+            features[column] for column in FEATURE_COLUMNS
+        )
+
+    @classmethod
+    def from_catalog(cls, columns):
+
+        if all(column in columns for column in CONTENT_COLUMNS):
+
+            features = None
+
+            if all(column in columns for column in FEATURE_COLUMNS):
+                features = {column: columns[column] for column in FEATURE_COLUMNS}
+
+            return cls(*(columns[column] for column in CONTENT_COLUMNS), features)
+
+        matrix = build_matrix(
+            movie_features(plot, genre, director, actors)
+            for plot, genre, director, actors in zip(
+                columns["plot"], columns["genre"], columns["director"], columns["actors"]
+            )
+        )
+
+        return cls(
+            *(matrix[column] for column in CONTENT_COLUMNS),
+            {column: matrix[column] for column in FEATURE_COLUMNS},
+        )
+
+    @classmethod
+    def empty(cls, size):
+
+        return cls(
+            np.zeros(size + 1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.float32),
+        )
+
+    def __len__(self):
+
+        return self.size
+
+    def _liked_query(self, positions):
+
+        query = np.zeros(1 << FEATURE_BITS, dtype=np.float64)
+
+        for position in positions:
+
+            start, end = self.indptr[position], self.indptr[position + 1]
+            np.add.at(query, self.indices[start:end], self.data[start:end])
+
+        return query
+
+    def _text_query(self, text):
+
+        query = np.zeros(1 << FEATURE_BITS, dtype=np.float64)
+        np.add.at(query, np.array(features(text), dtype=np.int64), 1.0)
+
+        return query
+
+    def scores(self, positions, text):
+
+        combined = np.zeros(1 << FEATURE_BITS, dtype=np.float64)
+
+        for query in (self._liked_query(positions), self._text_query(text)):
+
+            norm = np.sqrt(np.dot(query, query))
+
+            if norm > 0:
+                combined += query / norm
+
+        # Only the postings of the query's own features are touched, so a feed
+        # costs a few feature lists instead of a pass over every stored term.
+        active = np.flatnonzero(combined)
+        starts = self.feature_indptr[active]
+        lengths = self.feature_indptr[active + 1] - starts
+
+        if not lengths.sum():
+            return np.zeros(self.size, dtype=np.float64)
+
+        ends = np.cumsum(lengths)
+        entries = np.arange(ends[-1]) + np.repeat(starts - (ends - lengths), lengths)
+
+        return np.bincount(
+            self.feature_rows[entries],
+            weights=self.feature_data[entries] * np.repeat(combined[active], lengths),
+            minlength=self.size,
+        )
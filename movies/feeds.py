@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+
+class FeedCache:
+
+    def __init__(self, max_entries=1024):
+
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        with self._lock:
+
+            feed = self._feeds.get(key)
+
+            if feed is None:
+
+                self.misses += 1
+
+                return None
+
+            self._feeds.move_to_end(key)
+            self.hits += 1
+
+            return feed
+
+    def put(self, key, feed):
+
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+
+            self._feeds[key] = feed
+            self._feeds.move_to_end(key)
+
+            while len(self._feeds) > self.max_entries:
+
+                self._feeds.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+
+        with self._lock:
+
+            lookups = self.hits + self.misses
+
+            return {
+                "entries": len(self._feeds),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups if lookups else 0, 4),
+            }
@@ -0,0 +1,76 @@
+import threading
+
+
+class _Call:
+
+    def __init__(self):
+
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self):
+
+        self.calls = 0
+        self.saved = 0
+
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+
+        with self._lock:
+
+            self.calls += 1
+            call = self._inflight.get(key)
+
+            if call is not None:
+
+                self.saved += 1
+                leader = False
+
+            else:
+
+                call = _Call()
+                self._inflight[key] = call
+                leader = True
+
+        if not leader:
+
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+
+            call.result = fn(*args, **kwargs)
+
+            return call.result
+
+        except Exception as e:
+
+            call.error = e
+            raise
+
+        finally:
+
+            with self._lock:
+                del self._inflight[key]
+
+            call.done.set()
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "calls": self.calls,
+                "calls_saved": self.saved,
+                "in_flight": len(self._inflight),
+            }
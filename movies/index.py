@@ -0,0 +1,270 @@
+import math
+import numpy as np
+from movies.columns import IdPositions, StringColumn, group_rows
+
+RATING_STEPS = 100
+
+
+def _frozen(array):
+
+    if isinstance(array, np.ndarray) and array.flags.writeable:
+        array.setflags(write=False)
+
+    return array
+
+
+def rating_steps(ratings):
+
+    return np.clip(np.rint(np.asarray(ratings, dtype=np.float64) * 10), 0, RATING_STEPS)
+
+
+def best_rows(codes, ratings, size):
+
+    order = np.lexsort((-np.asarray(ratings, dtype=np.float64), codes))
+    starts = np.searchsorted(codes[order], np.arange(size))
+
+    return order[starts].astype(np.int64)
+
+
+def index_columns(ids, titles, years, ratings):
+
+    ids = np.asarray(ids, dtype=np.int64)
+
+    if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+        raise ValueError("Catalog rows must be sorted by unique movie id")
+
+    title = StringColumn.from_values(titles)
+    title_rows, title_starts = group_rows(title.codes, title.vocabulary_size)
+
+    steps = rating_steps(ratings).astype(np.int64)
+    counts = np.bincount(steps, minlength=RATING_STEPS + 1)
+    rating_offsets = np.zeros(RATING_STEPS + 2, dtype=np.int64)
+    rating_offsets[:-1] = np.cumsum(counts[::-1])[::-1]
+
+    return {
+        "id": ids,
+        "year": np.asarray(years, dtype=np.uint16),
+        "rating": np.asarray(ratings, dtype=np.float16),
+        "title_codes": title.codes,
+        "title_offsets": title.offsets,
+        "title_heap": title.heap,
+        "title_rows": title_rows,
+        "title_starts": title_starts,
+        "title_best": best_rows(title.codes, ratings, title.vocabulary_size),
+        "rating_order": np.argsort(-steps, kind="stable").astype(np.int64),
+        "rating_offsets": rating_offsets,
+    }
+
+
+class CatalogIndex:
+
+    def __init__(self, columns):
+
+        self.ids = _frozen(columns["id"])
+        self.years = _frozen(columns["year"])
+        self.ratings = _frozen(columns["rating"])
+        self.titles = StringColumn(
+            _frozen(columns["title_codes"]),
+            _frozen(columns["title_offsets"]),
+            _frozen(columns["title_heap"]),
+        )
+        self.title_codes = self.titles.codes
+        self.title_rows = _frozen(columns["title_rows"])
+        self.title_starts = _frozen(columns["title_starts"])
+
+        if "title_best" in columns:
+            self.title_best = _frozen(columns["title_best"])
+        else:
+            self.title_best = best_rows(
+                self.title_codes, self.ratings, self.titles.vocabulary_size
+            )
+
+        self.distinct_titles = np.zeros(len(self.ids), dtype=bool)
+        self.distinct_titles[self.title_best] = True
+        _frozen(self.distinct_titles)
+
+        self.positions = IdPositions(self.ids)
+
+        self.by_rating = _frozen(columns["rating_order"])
+        self.rating_offsets = _frozen(columns["rating_offsets"])
+
+        self.all = CatalogQuery(self, self.by_rating)
+        self._buckets = {}
+
+    @classmethod
+    def from_frame(cls, df):
+
+        df = df.sort_values("id", key=lambda ids: ids.astype(np.int64))
+
+        return cls(index_columns(df["id"], df["Title"], df["Year"], df["Rating"]))
+
+    def __len__(self):
+
+        return len(self.ids)
+
+    def __contains__(self, movie_id):
+
+        return movie_id in self.positions
+
+    def record_at(self, position):
+
+        return {
+            "id": str(self.ids[position]),
+            "title": self.titles[position],
+            "year": str(self.years[position]),
+            "rating": round(float(self.ratings[position]), 1),
+        }
+
+    def record(self, movie_id):
+
+        position = self.positions.get(movie_id)
+
+        if position is None:
+            return None
+
+        return self.record_at(position)
+
+    def positions_for_titles(self, titles):
+
+        rows = []
+
+        for title in titles:
+
+            first, last = self.titles.find(title)
+            rows.append(
+                self.title_rows[self.title_starts[first] : self.title_starts[last]]
+            )
+
+        return np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+
+    def rated(self, min_rating=None):
+
+        if min_rating is None or min_rating <= 0:
+            return self.all
+
+        step = min(math.ceil(min_rating * 10 - 1e-6), RATING_STEPS + 1)
+        query = self._buckets.get(step)
+
+        if query is None:
+
+            query = CatalogQuery(self, self.by_rating[: self.rating_offsets[step]])
+            self._buckets[step] = query
+
+        return query
+
+
+class CatalogQuery:
+
+    def __init__(self, index, positions):
+
+        self.index = index
+        self.positions = _frozen(positions)
+
+    def __len__(self):
+
+        return len(self.positions)
+
+    def _narrow(self, keep):
+
+        if keep.all():
+            return self
+
+        return CatalogQuery(self.index, self.positions[keep])
+
+    def where(
+        self,
+        min_rating=None,
+        max_rating=None,
+        min_year=None,
+        max_year=None,
+        title=None,
+    ):
+
+        query = self
+
+        if min_rating is not None:
+
+            if self is self.index.all:
+                query = self.index.rated(min_rating)
+            else:
+                query = query._narrow(
+                    rating_steps(self.index.ratings[query.positions])
+                    >= math.ceil(min_rating * 10 - 1e-6)
+                )
+
+        if max_rating is not None:
+            query = query._narrow(
+                rating_steps(self.index.ratings[query.positions])
+                <= math.floor(max_rating * 10 + 1e-6)
+            )
+
+        if min_year is not None:
+            query = query._narrow(self.index.years[query.positions] >= min_year)
+
+        if max_year is not None:
+            query = query._narrow(self.index.years[query.positions] <= max_year)
+
+        if title:
+
+            title = str(title).casefold()
+            query = query._narrow(
+                np.array(
+                    [
+                        title in str(name).casefold()
+                        for name in self.index.titles[query.positions]
+                    ],
+                    dtype=bool,
+                )
+            )
+
+        return query
+
+    def exclude(self, titles):
+
+        if not titles:
+            return self
+
+        return self._narrow(
+            ~np.isin(self.positions, self.index.positions_for_titles(titles))
+        )
+
+    def titled(self, titles):
+
+        return self._narrow(
+            np.isin(self.positions, self.index.positions_for_titles(titles))
+        )
+
+    def newest(self):
+
+        years = self.index.years[self.positions]
+
+        return CatalogQuery(
+            self.index, self.positions[np.argsort(-years, kind="stable")]
+        )
+
+    def sample(self, n, rng, pool=None, weighted=False):
+
+        candidates = self.positions
+
+        if pool is not None and pool > 0:
+            candidates = candidates[: max(pool, n)]
+
+        n = min(n, len(candidates))
+
+        if n == 0:
+            return CatalogQuery(self.index, candidates[:0])
+
+        p = None
+
+        if weighted:
+
+            weights = np.maximum(self.index.ratings[candidates].astype(np.float64), 0.1)
+            p = weights / weights.sum()
+
+        return CatalogQuery(
+            self.index, rng.choice(candidates, size=n, replace=False, p=p)
+        )
+
+    def records(self):
+
+        return [self.index.record_at(position) for position in self.positions]
@@ -0,0 +1,268 @@
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+from movies.columns import StringColumn
+
+STOP_WORDS = frozenset(
+    """
+    a about all also am an and any anything are as at be but by can could do
+    enjoy enjoys film films for from get good great i i'm im in into is it its
+    just kind kinds like likes lot love loves me more movie movies much my no
+    not of on or really so some something stuff that the them things this to
+    too very want watch watching we with would you
+    """.split()
+)
+
+PHRASE_ALIASES = {
+    "science fiction": "sci-fi",
+    "sci fi": "sci-fi",
+    "rom com": "romance comedy",
+    "rom-com": "romance comedy",
+    "feel good": "comedy family",
+    "feel-good": "comedy family",
+    "true story": "biography",
+    "film noir": "film-noir",
+}
+
+TOKEN_ALIASES = {
+    "scifi": "sci-fi",
+    "comedies": "comedy",
+    "comedic": "comedy",
+    "funny": "comedy",
+    "hilarious": "comedy",
+    "dramas": "drama",
+    "dramatic": "drama",
+    "scary": "horror",
+    "spooky": "horror",
+    "thrillers": "thriller",
+    "thrilling": "thriller",
+    "suspense": "thriller",
+    "suspenseful": "thriller",
+    "romantic": "romance",
+    "romances": "romance",
+    "animated": "animation",
+    "cartoon": "animation",
+    "cartoons": "animation",
+    "anime": "animation",
+    "kids": "family",
+    "children": "family",
+    "musicals": "musical",
+    "documentaries": "documentary",
+    "docs": "documentary",
+    "westerns": "western",
+    "mysteries": "mystery",
+    "adventures": "adventure",
+    "fantasies": "fantasy",
+    "biopic": "biography",
+    "biopics": "biography",
+    "historical": "history",
+    "sports": "sport",
+    "crimes": "crime",
+    "wars": "war",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+PHRASE_PATTERN = re.compile(
+    r"\b(?:"
+    + "|".join(
+        re.escape(phrase) for phrase in sorted(PHRASE_ALIASES, key=len, reverse=True)
+    )
+    + r")\b"
+)
+
+
+def tokenize(text):
+
+    if not text or text == "N/A":
+        return []
+
+    text = str(text).casefold()
+
+    text = PHRASE_PATTERN.sub(lambda match: PHRASE_ALIASES[match.group()], text)
+
+    tokens = []
+
+    for token in TOKEN_PATTERN.findall(text):
+
+        token = TOKEN_ALIASES.get(token, token)
+
+        if token not in STOP_WORDS:
+            tokens.extend(token.split())
+
+    return tokens
+
+
+def build_postings(texts):
+
+    postings = {}
+
+    for position, text in enumerate(texts):
+
+        for token in set(tokenize(text)):
+            postings.setdefault(token, []).append(position)
+
+    vocabulary = StringColumn.from_values(postings)
+    indptr = np.zeros(vocabulary.vocabulary_size + 1, dtype=np.int64)
+    indices = []
+
+    for code in range(vocabulary.vocabulary_size):
+
+        positions = postings[vocabulary.value(code)]
+        indptr[code + 1] = indptr[code] + len(positions)
+        indices.extend(positions)
+
+    return {
+        "preference_offsets": vocabulary.offsets,
+        "preference_heap": vocabulary.heap,
+        "preference_indptr": indptr,
+        "preference_indices": np.array(indices, dtype=np.int32),
+    }
+
+
+class Postings(Mapping):
+
+    def __init__(self, offsets, heap, indptr, indices):
+
+        self.vocabulary = StringColumn(None, offsets, heap)
+        self.indptr = indptr
+        self.indices = indices
+
+    def __getitem__(self, token):
+
+        first, last = self.vocabulary.find(token)
+
+        if first == last:
+            raise KeyError(token)
+
+        return self.indices[self.indptr[first] : self.indptr[first + 1]]
+
+    def __iter__(self):
+
+        return iter(self.vocabulary)
+
+    def __len__(self):
+
+        return self.vocabulary.vocabulary_size
+
+
+class PreferenceIndex:
+
+    def __init__(self, postings, size, cache_size=256, cache_bytes=64 << 20):
+
+        self.size = size
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.postings = postings
+
+        self.hits = 0
+        self.misses = 0
+
+        self._compiled = OrderedDict()
+        self._compiled_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_texts(cls, texts, size, cache_size=256):
+
+        postings = {}
+
+        for position, text in texts:
+
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(position)
+
+        return cls(
+            {
+                token: np.array(positions, dtype=np.int32)
+                for token, positions in postings.items()
+            },
+            size,
+            cache_size,
+        )
+
+    @classmethod
+    def from_catalog(cls, columns, size, cache_size=256):
+
+        return cls(
+            Postings(
+                columns["preference_offsets"],
+                columns["preference_heap"],
+                columns["preference_indptr"],
+                columns["preference_indices"],
+            ),
+            size,
+            cache_size,
+        )
+
+    def __len__(self):
+
+        return len(self.postings)
+
+    def positions(self, preferences):
+
+        key = tuple(sorted(set(tokenize(preferences))))
+
+        with self._lock:
+
+            positions = self._compiled.get(key)
+
+            if positions is not None:
+
+                self._compiled.move_to_end(key)
+                self.hits += 1
+
+                return positions
+
+            self.misses += 1
+
+        matched = [self.postings.get(token) for token in key]
+        matched = [found for found in matched if found is not None]
+        positions = (
+            np.unique(np.concatenate(matched)).astype(np.int32)
+            if matched
+            else np.zeros(0, dtype=np.int32)
+        )
+        positions.setflags(write=False)
+
+        with self._lock:
+
+            if key not in self._compiled:
+                self._compiled[key] = positions
+                self._compiled_bytes += positions.nbytes
+
+            while self._compiled and (
+                len(self._compiled) > self.cache_size
+                or self._compiled_bytes > self.cache_bytes
+            ):
+                _, evicted = self._compiled.popitem(last=False)
+                self._compiled_bytes -= evicted.nbytes
+
+        return positions
+
+    def compile(self, preferences, weight=2.0):
+
+        # Only the sparse matches are cached; a dense catalog-sized vector per
+        # cached survey would dwarf the memory-mapped catalog itself.
+        vector = np.zeros(self.size, dtype=np.float64)
+        vector[self.positions(preferences)] = weight
+
+        return vector
+
+    def matches(self, preferences, text):
+
+        return not set(tokenize(preferences)).isdisjoint(tokenize(text))
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "tokens": len(self.postings),
+                "compiled": len(self._compiled),
+                "compiled_bytes": self._compiled_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
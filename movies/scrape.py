@@ -1,25 +1,78 @@
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 import os
 import requests
 import logging
+from movies.client import CircuitOpenError, shared_client
+from movies.flight import SingleFlight
+from movies.index import CatalogIndex
+from movies.preferences import PreferenceIndex
+from movies.content import ContentIndex
+from concurrent.futures import ThreadPoolExecutor, wait
+from movies.cache import MetadataCache, normalize_key
+from movies.catalog import movie_id, read_catalog
 
 logger = logging.getLogger(__name__)
 
 
 class scraper:
 
-    def __init__(self, api_key="use_local"):
+    def __init__(self, api_key="use_local", use_catalog=True, seed=None):
 
         self.movie_path = Path(__file__).parent / "results" / "movies.csv"
         self.base_url = "http://www.omdbapi.com/"
-        self.df = pd.read_csv(self.movie_path)
-        self.df["id"] = self.df.index.astype(str)
-        self.selected_df = self.df.copy()
         self.env_path = Path(__file__).parent.parent / ".env"
+        load_dotenv(dotenv_path=self.env_path)
+        self.catalog_path = Path(
+            os.getenv("MOVIE_CATALOG_PATH", Path(__file__).parent / "results" / "catalog")
+        )
+        self.columns = read_catalog(self.catalog_path) if use_catalog else None
+        if self.columns is not None:
+            self._df = None
+            self.index = CatalogIndex(self.columns)
+            self.content = ContentIndex.from_catalog(self.columns)
+            self.preferences = PreferenceIndex.from_catalog(
+                self.columns, len(self.index)
+            )
+        else:
+            self._df = pd.read_csv(self.movie_path)
+            self._df["id"] = [
+                str(movie_id(title, year))
+                for title, year in zip(self._df["Title"], self._df["Year"])
+            ]
+            self._df = self._df.drop_duplicates("id")
+            self._df.index = pd.Index(self._df["id"].to_numpy())
+            self.index = CatalogIndex.from_frame(self._df)
+            self.content = ContentIndex.empty(len(self.index))
+            self.preferences = PreferenceIndex.from_texts((), len(self.index))
+        self.catalog = self.index.all
+        seed = os.getenv("MOVIE_SAMPLE_SEED") if seed is None else seed
+        self.rng = np.random.default_rng(int(seed) if seed not in (None, "") else None)
+        self._rng_lock = threading.Lock()
+        self.cache = MetadataCache(
+            os.getenv(
+                "OMDB_CACHE_PATH", Path(__file__).parent / "results" / "omdb_cache.sqlite"
+            ),
+            ttl=int(os.getenv("OMDB_CACHE_TTL", str(30 * 86400))),
+            negative_ttl=int(os.getenv("OMDB_CACHE_NEGATIVE_TTL", "86400")),
+        )
+        self.enrich_concurrency = int(os.getenv("OMDB_CONCURRENCY", "8"))
+        self.enrich_deadline = float(os.getenv("OMDB_FEED_DEADLINE", "3"))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.http = shared_client(
+            "omdb",
+            timeout=float(os.getenv("OMDB_TIMEOUT", "5")),
+            retries=int(os.getenv("OMDB_RETRIES", "2")),
+            pool_size=self.enrich_concurrency,
+            failure_threshold=int(os.getenv("OMDB_BREAKER_FAILURES", "5")),
+            reset_after=float(os.getenv("OMDB_BREAKER_RESET", "30")),
+        )
         if api_key == "use_local":
-            load_dotenv(dotenv_path=self.env_path)
             self.api_key = os.getenv("OMDB_API_KEY")
             if not self.api_key:
                 logger.error("OMDB_API_KEY not found in .env file!")
@@ -31,194 +84,198 @@ class scraper:
             self.api_key = api_key
             logger.info("Using provided API key")
 
-    def exclude_list_of_titles(self, exclude_titles):
+    @property
+    def df(self):
 
-        return_exclude = self.selected_df[
-            self.selected_df["Title"].isin(exclude_titles)
-        ]
-        self.selected_df = self.selected_df[
-            ~self.selected_df["Title"].isin(exclude_titles)
-        ]
+        if self._df is None:
 
-        return self.selected_df, return_exclude
+            self._df = pd.DataFrame(
+                {
+                    "Title": list(self.index.titles),
+                    "Year": self.index.years.astype(int),
+                    "Rating": self.index.ratings.astype(float).round(1),
+                    "id": self.index.ids.astype(str),
+                }
+            )
+            self._df.index = pd.Index(self._df["id"].to_numpy())
 
-    def by_min_rating(self, min_rating):
+        return self._df
 
-        self.selected_df = self.selected_df[self.selected_df["Rating"] >= min_rating]
+    def _baked_details(self, title, year):
 
-        return self.selected_df
+        if self.columns is None or year in (None, ""):
+            return None
 
-    def by_min_year(self, min_year):
+        for position in self.index.positions_for_titles([title]):
 
-        self.selected_df = self.selected_df[self.selected_df["Year"] >= min_year]
+            if str(self.index.years[position]) == str(year).strip():
 
-        return self.selected_df
+                return {
+                    field: self.columns[field][position]
+                    for field in ("poster", "plot", "genre", "director", "actors")
+                }
 
-    def by_max_rating(self, max_rating):
+        return None
 
-        self.selected_df = self.selected_df[self.selected_df["Rating"] <= max_rating]
+    def get_random_movie(self, priority="None", pool=15, movies=None):
 
-        return self.selected_df
+        picked = self.get_random_movies(1, priority=priority, pool=pool, movies=movies)
 
-    def by_max_year(self, max_year):
+        return picked[0] if picked else None
 
-        self.selected_df = self.selected_df[self.selected_df["Year"] <= max_year]
+    def get_random_movies(
+        self, n=10, priority="None", pool=15, movies=None, weighted=False
+    ):
 
-        return self.selected_df
+        movies = self.catalog if movies is None else movies
 
-    def by_specific_title(self, title):
+        if priority == "None":
+            pool = None
+        elif priority == "Year":
+            movies = movies.newest()
+        elif priority != "Rating":
+            movies = movies.where(title=priority)
 
-        self.selected_df = self.selected_df[
-            self.selected_df["Title"].str.contains(title, case=False, na=False)
-        ]
+        with self._rng_lock:
+            picked = movies.sample(n, self.rng, pool=pool, weighted=weighted)
 
-        return self.selected_df
+        return picked.records()
 
-    def by_specific_year(self, year):
+    def max_min_rating(self):
 
-        self.selected_df = self.df[self.df["Year"] == year]
+        max_rating = round(float(self.index.ratings.max()), 1)
+        min_rating = round(float(self.index.ratings.min()), 1)
 
-        return self.selected_df
+        return max_rating, min_rating
 
-    def by_specific_rating(self, rating):
+    def query(self, query):
 
-        self.selected_df = self.df[self.df["Rating"] == rating]
+        return self.catalog.where(title=query)
 
-        return self.selected_df
+    def get_all(self):
 
-    def by_min_rating_and_year(self, min_rating, min_year):
+        return self.df
 
-        self.selected_df = self.df[
-            (self.df["Rating"] >= min_rating) & (self.df["Year"] >= min_year)
-        ]
+    def load_movies(self, min_rating=None):
 
-        return self.selected_df
+        return {
+            record["id"]: record
+            for record in self.catalog.where(min_rating=min_rating).records()
+        }
 
-    def get_random_movie(self, priority="None", pool=15):
+    def get_info_from_params(self, params):
+        if not self.api_key:
+            logger.error("Cannot make OMDB request - API key not set")
+            return {"Response": "False", "Error": "API key not configured"}
 
-        if priority == "None":
+        params["apikey"] = self.api_key
 
-            return self.selected_df.sample(n=1)
+        try:
+            logger.debug(f"OMDB Request: {self.base_url} with params: {params}")
+            r = self.http.get(self.base_url, endpoint="omdb", params=params)
+            data = r.json()
+            logger.debug(f"OMDB Response: {data}")
+            return data
+        except CircuitOpenError:
+            logger.warning("OMDB circuit open, skipping request")
+            return {"Response": "False", "Error": "OMDB unavailable"}
+        except requests.exceptions.Timeout:
+            logger.error("OMDB API request timed out")
+            return {"Response": "False", "Error": "Request timeout"}
+        except Exception as e:
+            logger.error(f"OMDB API request failed: {str(e)}")
+            return {"Response": "False", "Error": str(e)}
 
-        elif priority == "Rating":
+    def get_info_from_title(self, title):
 
-            return (
-                self.selected_df.sort_values(by="Rating", ascending=False)
-                .head(pool)
-                .sample(n=1)
-            )
+        params = {"t": title}
 
-        elif priority == "Year":
+        return self.get_info_from_params(params)
 
-            return (
-                self.selected_df.sort_values(by="Year", ascending=False)
-                .head(pool)
-                .head(pool)
-                .sample(n=1)
-            )
+    def _known_details(self, title, year=None):
 
-        else:
+        baked = self._baked_details(title, year)
 
-            return (
-                self.selected_df[
-                    self.selected_df["Title"].str.contains(
-                        priority, case=False, na=False
-                    )
-                ]
-                .head(pool)
-                .sample(n=1)
-            )
+        if baked is not None:
+            return True, baked
 
-    def get_random_movies(self, n=10, priority="None", pool=15):
+        found, cached = self.cache.get(title, year)
 
-        if priority == "None":
+        if found:
+            logger.debug(f"Movie '{title}' - served from OMDB cache")
+            return True, cached if cached is not None else self._default_movie_details()
 
-            sample_size = min(n, len(self.selected_df))
-            random_sample = self.selected_df.sample(n=sample_size)
-            movies = []
+        return False, None
 
-            for idx, row in random_sample.iterrows():
+    def enrich_movie_details(self, title, year=None):
+        found, details = self._known_details(title, year)
 
-                movie_dict = row.to_dict()
-                movies.append(movie_dict)
+        if found:
+            return details
 
-            return movies
+        return self._fetch_coalesced(title, year)
 
-        else:
+    def _fetch_coalesced(self, title, year=None):
 
-            movies = []
+        return self.flights.do(
+            normalize_key(title, year), self._fetch_movie_details, title, year
+        )
 
-            for _ in range(n):
+    def _pool(self):
 
-                movie = self.get_random_movie(priority=priority, pool=pool)
-                movie_dict = movie.iloc[0].to_dict()
-                movies.append(movie_dict)
+        if self._executor is None:
 
-            return movies
+            with self._executor_lock:
 
-    def max_min_rating(self):
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.enrich_concurrency,
+                        thread_name_prefix="omdb",
+                    )
 
-        max_rating = self.df["Rating"].max()
-        min_rating = self.df["Rating"].min()
+        return self._executor
 
-        return max_rating, min_rating
+    def enrich_many(self, titles, deadline=None):
 
-    def query(self, query):
+        deadline = self.enrich_deadline if deadline is None else deadline
+        results = [None] * len(titles)
+        pending = {}
 
-        self.selected_df = self.df[
-            self.df["Title"].str.contains(query, case=False, na=False)
-        ]
+        for i, (title, year) in enumerate(titles):
 
-        return self.selected_df
+            found, details = self._known_details(title, year)
 
-    def get_all(self):
+            if found:
+                results[i] = details
+            else:
+                pending.setdefault((title, year), []).append(i)
 
-        return self.df
+        if pending:
 
-    def load_movies(self, min_rating=None):
-        df = self.df.copy()
-
-        if min_rating is not None:
-            df = df[df["Rating"] >= min_rating]
-
-        movies = {}
-        for idx, row in df.iterrows():
-            movies[row["id"]] = {
-                "id": row["id"],
-                "title": row["Title"],
-                "year": str(row["Year"]),
-                "rating": float(row["Rating"]),
+            futures = {
+                self._pool().submit(self._fetch_coalesced, title, year): indexes
+                for (title, year), indexes in pending.items()
             }
 
-        return movies
+            done, not_done = wait(futures, timeout=deadline)
 
-    def get_info_from_params(self, params):
-        if not self.api_key:
-            logger.error("Cannot make OMDB request - API key not set")
-            return {"Response": "False", "Error": "API key not configured"}
+            for future in done:
 
-        params["apikey"] = self.api_key
+                for i in futures[future]:
+                    results[i] = future.result()
 
-        try:
-            logger.debug(f"OMDB Request: {self.base_url} with params: {params}")
-            r = requests.get(f"{self.base_url}", params=params, timeout=5)
-            data = r.json()
-            logger.debug(f"OMDB Response: {data}")
-            return data
-        except requests.exceptions.Timeout:
-            logger.error("OMDB API request timed out")
-            return {"Response": "False", "Error": "Request timeout"}
-        except Exception as e:
-            logger.error(f"OMDB API request failed: {str(e)}")
-            return {"Response": "False", "Error": str(e)}
-
-    def get_info_from_title(self, title):
-
-        params = {"t": title}
+            if not_done:
+                logger.warning(
+                    f"{len(not_done)} of {len(futures)} OMDB lookups missed the "
+                    f"{deadline}s deadline, using placeholders"
+                )
 
-        return self.get_info_from_params(params)
+        return [
+            details if details is not None else self._default_movie_details()
+            for details in results
+        ]
 
-    def enrich_movie_details(self, title, year=None):
+    def _fetch_movie_details(self, title, year=None):
         logger.info(f"Enriching movie: '{title}' ({year if year else 'no year'})")
 
         try:
@@ -242,16 +299,20 @@ class scraper:
                 else:
                     logger.warning(f"✗ Movie '{title}' - No plot available")
 
-                return {
+                details = {
                     "poster": poster,
                     "plot": plot,
                     "genre": info.get("Genre", "N/A"),
                     "director": info.get("Director", "N/A"),
                     "actors": info.get("Actors", "N/A"),
                 }
+                self.cache.put(title, year, details)
+                return details
             else:
                 error_msg = info.get("Error", "Unknown error")
                 logger.warning(f"✗ Movie '{title}' - OMDB returned error: {error_msg}")
+                if error_msg.lower().startswith("movie not found"):
+                    self.cache.put(title, year, None)
                 return self._default_movie_details()
 
         except Exception as e:
@@ -295,6 +356,6 @@ class scraper:
 if __name__ == "__main__":
 
     scraper = scraper()
-    scraper.by_min_rating_and_year(5, 2000)
+    print(len(scraper.catalog.where(min_rating=5, min_year=2000)))
     print(scraper.get_info_from_list("Home Alone", 1990))
     print(scraper.max_min_rating())
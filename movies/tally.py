@@ -0,0 +1,238 @@
+import heapq
+import threading
+
+FIRST_ROUND = 10
+FULL_ROUND = 20
+
+
+class VoteTally:
+
+    def __init__(self):
+
+        self.choices = {}
+        self.counts = {}
+        self.histogram = {}
+        self.min_votes = 0
+        self.below_first = 0
+        self.below_full = 0
+
+        self.likes = {}
+        self.universal = 0
+
+        self._order = {}
+        self._next_order = 0
+        self._heap = []
+
+    @classmethod
+    def from_room(cls, room_data):
+
+        tally = cls()
+
+        for member_id, member in room_data["members"].items():
+
+            tally.add_member(member_id)
+
+            for movie_id, choice in member["movie_choices"].items():
+                tally._count(member_id, movie_id, choice == "like")
+
+        for movie_id, likers in room_data.get("mutual_likes", {}).items():
+
+            if likers:
+                tally._set_likes(movie_id, len(likers))
+
+        return tally
+
+    def add_member(self, member_id):
+
+        if member_id in self.choices:
+            return
+
+        self.choices[member_id] = {}
+        self.counts[member_id] = 0
+        self.histogram[0] = self.histogram.get(0, 0) + 1
+        self.min_votes = 0
+        self.below_first += 1
+        self.below_full += 1
+
+        self.universal = 0
+
+    def _count(self, member_id, movie_id, liked):
+
+        choices = self.choices[member_id]
+        previous = choices.get(movie_id)
+        choices[movie_id] = liked
+
+        if previous is not None:
+            return previous
+
+        count = self.counts[member_id]
+        self.counts[member_id] = count + 1
+
+        self.histogram[count] -= 1
+        self.histogram[count + 1] = self.histogram.get(count + 1, 0) + 1
+
+        if not self.histogram[count]:
+
+            del self.histogram[count]
+
+            if count == self.min_votes:
+                self.min_votes += 1
+
+        if count + 1 == FIRST_ROUND:
+            self.below_first -= 1
+
+        if count + 1 == FULL_ROUND:
+            self.below_full -= 1
+
+        return None
+
+    def _set_likes(self, movie_id, likes):
+
+        members = len(self.choices)
+        before = self.likes.get(movie_id, 0)
+
+        if before == members:
+            self.universal -= 1
+
+        if likes == members:
+            self.universal += 1
+
+        if likes == 0:
+
+            self.likes.pop(movie_id, None)
+            self._order.pop(movie_id, None)
+
+            return
+
+        if movie_id not in self._order:
+
+            self._order[movie_id] = self._next_order
+            self._next_order += 1
+
+        self.likes[movie_id] = likes
+        heapq.heappush(self._heap, (-likes, self._order[movie_id], movie_id))
+
+        if len(self._heap) > 2 * len(self.likes) + 64:
+            self._compact()
+
+    def _compact(self):
+
+        self._heap = [
+            (-likes, self._order[movie_id], movie_id)
+            for movie_id, likes in self.likes.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def vote(self, member_id, movie_id, choice):
+
+        self.add_member(member_id)
+
+        liked = choice == "like"
+        previous = self._count(member_id, movie_id, liked)
+
+        if liked and not previous:
+            self._set_likes(movie_id, self.likes.get(movie_id, 0) + 1)
+        elif not liked and previous:
+            self._set_likes(movie_id, self.likes[movie_id] - 1)
+
+    def complete(self):
+
+        if not self.choices:
+            return False
+
+        return self.below_full == 0 or (self.below_first == 0 and self.universal > 0)
+
+    def top(self, k=3):
+
+        top = []
+
+        while self._heap and len(top) < k:
+
+            entry = heapq.heappop(self._heap)
+            likes, movie_id = -entry[0], entry[2]
+
+            if self.likes.get(movie_id) != likes or self._order[movie_id] != entry[1]:
+                continue
+
+            if top and top[-1][2] == movie_id:
+                continue
+
+            top.append(entry)
+
+        for entry in top:
+            heapq.heappush(self._heap, entry)
+
+        return [{"movie_id": movie_id, "likes": -likes} for likes, _, movie_id in top]
+
+
+class RoomTallies:
+
+    def __init__(self):
+
+        self.rebuilds = 0
+        self.updates = 0
+
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record, previous_seq):
+
+        code = record["room"]
+
+        with self._lock:
+
+            entry = self._rooms.get(code)
+
+            if entry is None:
+                return
+
+            if record["op"] in ("create", "delete") or entry[0] != previous_seq:
+
+                del self._rooms[code]
+
+                return
+
+            tally = entry[1]
+
+            if record["op"] == "join":
+
+                if record["member"] in tally.choices:
+
+                    del self._rooms[code]
+
+                    return
+
+                tally.add_member(record["member"])
+
+            elif record["op"] == "vote":
+
+                tally.vote(record["member"], record["movie"], record["choice"])
+                self.updates += 1
+
+            self._rooms[code] = (record["seq"], tally)
+
+    def tally(self, code, room_data):
+
+        with self._lock:
+
+            entry = self._rooms.get(code)
+
+            if entry is None or entry[0] != room_data.get("seq"):
+
+                tally = VoteTally.from_room(room_data)
+                self._rooms[code] = (room_data.get("seq"), tally)
+                self.rebuilds += 1
+
+                return tally
+
+            return entry[1]
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "rooms": len(self._rooms),
+                "rebuilds": self.rebuilds,
+                "incremental_updates": self.updates,
+            }
@@ -0,0 +1,275 @@
+import threading
+import numpy as np
+
+LIKE = 1
+DISLIKE = -1
+
+CHOICE_VALUES = {"like": LIKE, "dislike": DISLIKE}
+CHOICE_WEIGHTS = {0: 0.0, LIKE: 0.5, DISLIKE: -0.3}
+
+
+class VoteMatrix:
+
+    def __init__(self, positions, size):
+
+        self.positions = positions
+        self.size = size
+
+        self.member_ids = []
+        self._rows = {}
+        self._slots = {}
+        self.slot_positions = np.zeros(0, dtype=np.int64)
+
+        self.votes = np.zeros((0, 0), dtype=np.int8)
+        self.weights = np.zeros((0, 0), dtype=np.float64)
+        self.agreement = np.zeros((0, 0), dtype=np.int32)
+        self.weighted = np.zeros((0, 0), dtype=np.float64)
+        self.likes = np.zeros(0, dtype=np.int32)
+        self.dislikes = np.zeros(0, dtype=np.int32)
+
+    @classmethod
+    def from_members(cls, members, positions, size):
+
+        matrix = cls(positions, size)
+        rows, cols, values = [], [], []
+
+        for member_id, member in members.items():
+
+            row = matrix.add_member(member_id)
+
+            for movie_id, choice in member.get("movie_choices", {}).items():
+
+                position = positions.get(movie_id)
+                value = CHOICE_VALUES.get(choice)
+
+                if position is None or value is None:
+                    continue
+
+                rows.append(row)
+                cols.append(position)
+                values.append(value)
+
+        slot_positions, slots = np.unique(
+            np.array(cols, dtype=np.int64), return_inverse=True
+        )
+        matrix._grow(len(matrix.member_ids), len(slot_positions))
+        matrix.slot_positions[: len(slot_positions)] = slot_positions
+        matrix._slots = {int(p): slot for slot, p in enumerate(slot_positions)}
+
+        n, k = len(matrix.member_ids), len(slot_positions)
+        votes = matrix.votes[:n, :k]
+        votes[rows, slots] = values
+
+        liked = (votes == LIKE).astype(np.float64)
+        disliked = (votes == DISLIKE).astype(np.float64)
+        agreement = (liked @ liked.T + disliked @ disliked.T).astype(np.int32)
+        np.fill_diagonal(agreement, 0)
+
+        matrix.agreement[:n, :n] = agreement
+        matrix.weights[:n, :k] = liked * 0.5 - disliked * 0.3
+        matrix.weighted[:n, :k] = agreement @ matrix.weights[:n, :k]
+        matrix.likes[:k] = liked.sum(axis=0)
+        matrix.dislikes[:k] = disliked.sum(axis=0)
+
+        return matrix
+
+    def _grow(self, members, slots):
+
+        rows, cols = self.votes.shape
+
+        if members <= rows and slots <= cols:
+            return
+
+        rows = rows if members <= rows else max(members, rows * 2, 4)
+        cols = cols if slots <= cols else max(slots, cols * 2, 64)
+
+        def resized(array, shape):
+
+            grown = np.zeros(shape, dtype=array.dtype)
+            grown[tuple(slice(0, n) for n in array.shape)] = array
+
+            return grown
+
+        self.votes = resized(self.votes, (rows, cols))
+        self.weights = resized(self.weights, (rows, cols))
+        self.weighted = resized(self.weighted, (rows, cols))
+        self.agreement = resized(self.agreement, (rows, rows))
+        self.slot_positions = resized(self.slot_positions, (cols,))
+        self.likes = resized(self.likes, (cols,))
+        self.dislikes = resized(self.dislikes, (cols,))
+
+    def add_member(self, member_id):
+
+        if member_id in self._rows:
+            return self._rows[member_id]
+
+        self._grow(len(self.member_ids) + 1, len(self._slots))
+        self._rows[member_id] = len(self.member_ids)
+        self.member_ids.append(member_id)
+
+        return self._rows[member_id]
+
+    def _slot(self, position):
+
+        slot = self._slots.get(position)
+
+        if slot is None:
+
+            slot = len(self._slots)
+            self._grow(len(self.member_ids), slot + 1)
+            self._slots[position] = slot
+            self.slot_positions[slot] = position
+
+        return slot
+
+    def vote(self, member_id, movie_id, choice):
+
+        position = self.positions.get(movie_id)
+        value = CHOICE_VALUES.get(choice)
+
+        if position is None or value is None:
+            return
+
+        row = self.add_member(member_id)
+        slot = self._slot(position)
+        n, k = len(self.member_ids), len(self._slots)
+
+        column = self.votes[:n, slot]
+        old = int(column[row])
+
+        if old == value:
+            return
+
+        agree = (column == value).astype(np.int32)
+
+        if old:
+            agree -= column == old
+
+        agree[row] = 0
+
+        self.agreement[row, :n] += agree
+        self.agreement[:n, row] += agree
+
+        changed = np.flatnonzero(agree)
+
+        if len(changed):
+
+            self.weighted[row, :k] += agree[changed] @ self.weights[changed, :k]
+            self.weighted[changed, :k] += agree[changed, None] * self.weights[row, :k]
+
+        delta = CHOICE_WEIGHTS[value] - CHOICE_WEIGHTS[old]
+        self.weighted[:n, slot] += self.agreement[:n, row] * delta
+        self.weights[row, slot] = CHOICE_WEIGHTS[value]
+        self.votes[row, slot] = value
+
+        if old == LIKE:
+            self.likes[slot] -= 1
+        elif old == DISLIKE:
+            self.dislikes[slot] -= 1
+
+        if value == LIKE:
+            self.likes[slot] += 1
+        else:
+            self.dislikes[slot] += 1
+
+    def scores(self, member_id):
+
+        row = self._rows[member_id]
+        k = len(self._slots)
+        positions = self.slot_positions[:k]
+
+        collaborative = np.zeros(self.size, dtype=np.float64)
+        collaborative[positions] = (
+            self.likes[:k] - self.dislikes[:k] * 0.5 + self.weighted[row, :k]
+        )
+
+        like_counts = np.zeros(self.size, dtype=np.int64)
+        like_counts[positions] = self.likes[:k]
+
+        unrated = np.ones(self.size, dtype=bool)
+        unrated[positions[self.votes[row, :k] != 0]] = False
+
+        return collaborative, like_counts, unrated
+
+
+class RoomVotes:
+
+    def __init__(self, positions, size):
+
+        self.positions = positions
+        self.size = size
+
+        self.rebuilds = 0
+        self.updates = 0
+
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record, previous_seq):
+
+        code = record["room"]
+
+        with self._lock:
+
+            entry = self._rooms.get(code)
+
+            if entry is None:
+                return
+
+            if record["op"] in ("create", "delete") or entry[0] != previous_seq:
+
+                del self._rooms[code]
+
+                return
+
+            matrix = entry[1]
+
+            if record["op"] == "join":
+                matrix.add_member(record["member"])
+            elif record["op"] == "vote":
+                matrix.vote(record["member"], record["movie"], record["choice"])
+                self.updates += 1
+
+            self._rooms[code] = (record["seq"], matrix)
+
+    def scores(self, code, room_data, member_id):
+
+        with self._lock:
+
+            entry = self._rooms.get(code)
+
+            if entry is None or entry[0] != room_data.get("seq"):
+
+                matrix = VoteMatrix.from_members(
+                    room_data["members"], self.positions, self.size
+                )
+                self._rooms[code] = (room_data.get("seq"), matrix)
+                self.rebuilds += 1
+
+            else:
+                matrix = entry[1]
+
+            matrix.add_member(member_id)
+
+            return matrix.scores(member_id)
+
+    def stats(self):
+
+        with self._lock:
+
+            return {
+                "rooms": len(self._rooms),
+                "rebuilds": self.rebuilds,
+                "incremental_updates": self.updates,
+            }
+
+
+def top_k(scores, k):
+
+    if k < len(scores):
+
+        part = np.argpartition(-scores, k)[:k]
+
+        return part[np.argsort(-scores[part], kind="stable")]
+
+    return np.argsort(-scores, kind="stable")
@@ -0,0 +1,180 @@
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from storage.records import apply_record
+from storage.sqlite_store import SqliteRoomStore
+from storage.store import RoomStore
+
+
+def make_room(code, members=4, votes=20):
+
+    room_data = {
+        "members": {},
+        "host": f"{code}-0",
+        "chat_started": True,
+        "data": [{"name": "bench", "message": "hello"}],
+        "mutual_likes": {},
+    }
+
+    for i in range(members):
+
+        room_data["members"][f"{code}-{i}"] = {
+            "name": f"member {i}",
+            "is_host": i == 0,
+            "survey": {"preferences": "comedy family", "min_rating": 7},
+            "movie_choices": {},
+        }
+
+    rooms = {code: room_data}
+    seq = 0
+
+    for member_id in list(room_data["members"]):
+
+        for movie in random.sample(range(250), votes):
+
+            seq += 1
+            apply_record(
+                rooms,
+                {
+                    "seq": seq,
+                    "op": "vote",
+                    "room": code,
+                    "member": member_id,
+                    "movie": str(movie),
+                    "choice": random.choice(["like", "dislike"]),
+                },
+            )
+
+    return room_data
+
+
+def make_rooms(n):
+
+    return {f"R{i:06d}": make_room(f"R{i:06d}") for i in range(n)}
+
+
+def swipes(code, count):
+
+    member_id = f"{code}-1"
+
+    for i in range(count):
+
+        yield member_id, str(i % 250), "like" if i % 3 else "dislike"
+
+
+def bench_legacy(path, rooms, code, count):
+
+    with open(path, "w") as f:
+        json.dump(rooms, f, indent=4)
+
+    timings = []
+
+    for member_id, movie_id, choice in swipes(code, count):
+
+        started = time.perf_counter()
+
+        with open(path, "r") as f:
+            loaded = json.load(f)
+
+        loaded[code]["members"][member_id]["movie_choices"][movie_id] = choice
+
+        with open(path, "w") as f:
+            json.dump(loaded, f, indent=4)
+
+        timings.append(time.perf_counter() - started)
+
+    return timings
+
+
+def bench_store(store, code, count):
+
+    timings = []
+
+    for member_id, movie_id, choice in swipes(code, count):
+
+        started = time.perf_counter()
+
+        with store.transaction(code):
+            store.apply(code, "vote", member=member_id, movie=movie_id, choice=choice)
+
+        timings.append(time.perf_counter() - started)
+
+    return timings
+
+
+def bench_json(path, rooms, code, count):
+
+    with open(path, "w") as f:
+        json.dump(rooms, f)
+
+    store = RoomStore(path)
+
+    try:
+        return bench_store(store, code, count)
+    finally:
+        store.close()
+
+
+def bench_sqlite(json_path, sqlite_path, rooms, code, count):
+
+    with open(json_path, "w") as f:
+        json.dump(rooms, f)
+
+    store = SqliteRoomStore(sqlite_path, import_from=json_path)
+
+    try:
+        return bench_store(store, code, count)
+    finally:
+        store.close()
+
+
+def summarize(timings):
+
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+    return f"median {statistics.median(timings) * 1000:8.3f}ms  p99 {p99 * 1000:8.3f}ms"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Compare swipe latency per backend")
+    parser.add_argument("--rooms", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--swipes", type=int, default=200)
+    parser.add_argument("--legacy-swipes", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    for n in args.rooms:
+
+        rooms = make_rooms(n)
+        code = next(iter(rooms))
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            tmp = Path(tmp)
+
+            results = {
+                "legacy json": bench_legacy(
+                    tmp / "legacy.json", rooms, code, args.legacy_swipes
+                ),
+                "json journal": bench_json(tmp / "rooms.json", rooms, code, args.swipes),
+                "sqlite": bench_sqlite(
+                    tmp / "import.json", tmp / "rooms.sqlite", rooms, code, args.swipes
+                ),
+            }
+
+        print(f"{n} stored rooms")
+
+        for name, timings in results.items():
+            print(f"  {name:<14} {summarize(timings)}")
+
+
+if __name__ == "__main__":
+
+    main()
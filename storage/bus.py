@@ -0,0 +1,120 @@
+import atexit
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBusManager(socketio.PubSubManager):
+
+    name = "local"
+
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(
+        self, url="local://", channel="flask-socketio", write_only=False, logger=None
+    ):
+
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+        self.inbox = queue.Queue()
+        self.key = (urlparse(url).netloc, channel)
+
+        with self._channels_lock:
+            self._channels.setdefault(self.key, []).append(self.inbox)
+
+    def _publish(self, data):
+
+        message = self.json.dumps(data)
+
+        with self._channels_lock:
+            inboxes = list(self._channels.get(self.key, []))
+
+        for inbox in inboxes:
+
+            if inbox is not self.inbox:
+                inbox.put(message)
+
+    def _listen(self):
+
+        while True:
+            yield self.inbox.get()
+
+
+class UnixBusManager(socketio.PubSubManager):
+
+    name = "unix"
+
+    def __init__(
+        self,
+        url="unix:///tmp/north-pole-bus",
+        channel="flask-socketio",
+        write_only=False,
+        logger=None,
+    ):
+
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+        self.directory = Path(urlparse(url).path) / channel
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.address = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+
+        if not write_only:
+            self.sock.bind(str(self.address))
+            atexit.register(self.close)
+
+    def _publish(self, data):
+
+        message = self.json.dumps(data).encode("utf-8")
+
+        for peer in self.directory.glob("*.sock"):
+
+            if peer == self.address:
+                continue
+
+            try:
+
+                self.sock.sendto(message, str(peer))
+
+            except (ConnectionRefusedError, FileNotFoundError):
+
+                logger.info(f"Removing stale bus socket {peer}")
+                peer.unlink(missing_ok=True)
+
+            except OSError as e:
+
+                logger.error(f"Failed to publish to bus socket {peer}: {e}")
+
+    def _listen(self):
+
+        while True:
+            yield self.sock.recv(1 << 20)
+
+    def close(self):
+
+        self.sock.close()
+        self.address.unlink(missing_ok=True)
+
+
+def make_room_bus(url, channel="flask-socketio"):
+
+    if not url:
+        return None
+
+    if url.startswith("local://"):
+        return LocalBusManager(url, channel=channel)
+
+    if url.startswith("unix://"):
+        return UnixBusManager(url, channel=channel)
+
+    return None
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+
+    def __init__(self, path, fsync=False):
+
+        self.path = Path(path)
+        self.rotated_path = self.path.with_suffix(self.path.suffix + ".old")
+        self.fsync = fsync
+        self.records_written = 0
+        self._file = open(self.path, "a")
+
+    def append(self, record):
+
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self.records_written += 1
+
+    def replay(self):
+
+        for path in (self.rotated_path, self.path):
+
+            if not path.exists():
+                continue
+
+            with open(path, "r") as f:
+
+                for line_no, line in enumerate(f, start=1):
+
+                    line = line.strip()
+
+                    if not line:
+                        continue
+
+                    try:
+
+                        yield json.loads(line)
+
+                    except json.JSONDecodeError:
+
+                        logger.warning(
+                            f"Ignoring torn journal record at {path}:{line_no}"
+                        )
+                        break
+
+    def rotate(self):
+
+        self._file.close()
+
+        if self.rotated_path.exists():
+
+            with open(self.rotated_path, "a") as old, open(self.path, "r") as new:
+                old.write(new.read())
+
+            self.path.unlink()
+
+        else:
+
+            os.replace(self.path, self.rotated_path)
+
+        self._file = open(self.path, "a")
+        self.records_written = 0
+
+    def discard_rotated(self):
+
+        if self.rotated_path.exists():
+            self.rotated_path.unlink()
+
+    def reset(self):
+
+        self._file.close()
+        self.discard_rotated()
+        self._file = open(self.path, "w")
+        self.records_written = 0
+
+    def close(self):
+
+        self._file.close()
@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class RoomLocks:
+
+    def __init__(self, warn_after=0.05):
+
+        self.warn_after = warn_after
+
+        self._locks = {}
+        self._guard = threading.Lock()
+
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def lock_for(self, code):
+
+        lock = self._locks.get(code)
+
+        if lock is None:
+
+            with self._guard:
+                lock = self._locks.setdefault(code, threading.RLock())
+
+        return lock
+
+    @contextmanager
+    def hold(self, code):
+
+        lock = self.lock_for(code)
+
+        if lock.acquire(blocking=False):
+
+            waited = 0.0
+
+        else:
+
+            started = time.perf_counter()
+            lock.acquire()
+            waited = time.perf_counter() - started
+
+        try:
+
+            self._record(code, waited)
+
+            yield
+
+        finally:
+
+            lock.release()
+
+    def _record(self, code, waited):
+
+        with self._guard:
+
+            self.acquisitions += 1
+
+            if waited > 0:
+                self.contended += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+        if waited >= self.warn_after:
+            logger.warning(f"Waited {waited * 1000:.1f}ms for lock on room {code}")
+
+    def discard(self, code):
+
+        with self._guard:
+            self._locks.pop(code, None)
+
+    def stats(self):
+
+        with self._guard:
+
+            return {
+                "locks": len(self._locks),
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(
+                    self.total_wait * 1000 / self.contended if self.contended else 0,
+                    3,
+                ),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
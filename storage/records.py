@@ -0,0 +1,214 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def apply_join(room_data, record):
+
+    room_data["members"][record["member"]] = record["data"]
+
+
+def apply_vote(room_data, record):
+
+    member_id = record["member"]
+    movie_id = record["movie"]
+    choice = record["choice"]
+
+    room_data["members"][member_id]["movie_choices"][movie_id] = choice
+
+    if "mutual_likes" not in room_data:
+
+        room_data["mutual_likes"] = {}
+
+    mutual_likes = room_data["mutual_likes"]
+
+    if choice == "like":
+
+        if movie_id not in mutual_likes:
+
+            mutual_likes[movie_id] = []
+
+        if member_id not in mutual_likes[movie_id]:
+
+            mutual_likes[movie_id].append(member_id)
+
+    elif choice == "dislike":
+
+        if movie_id in mutual_likes:
+
+            if member_id in mutual_likes[movie_id]:
+
+                mutual_likes[movie_id].remove(member_id)
+
+            if not mutual_likes[movie_id]:
+                del mutual_likes[movie_id]
+
+
+def apply_survey(room_data, record):
+
+    room_data["members"][record["member"]]["survey"] = record["data"]
+
+
+def apply_suggest(room_data, record):
+
+    room_data["members"][record["member"]]["suggested_from_llm"] = record["data"]
+
+
+def apply_message(room_data, record):
+
+    room_data["data"].append(record["data"])
+
+
+def apply_start(room_data, record):
+
+    room_data["chat_started"] = True
+
+
+def apply_done(room_data, record):
+
+    room_data["voting_complete"] = True
+
+
+APPLIERS = {
+    "join": apply_join,
+    "vote": apply_vote,
+    "survey": apply_survey,
+    "suggest": apply_suggest,
+    "msg": apply_message,
+    "start": apply_start,
+    "done": apply_done,
+}
+
+VERSIONED_OPS = {"vote", "survey", "suggest"}
+
+MEMBER_OPS = {"vote", "survey", "suggest"}
+
+
+def migrate_room(room_data, legacy_ids):
+
+    changed = False
+
+    for member in room_data.get("members", {}).values():
+
+        choices = member.get("movie_choices", {})
+
+        if any(movie_id in legacy_ids for movie_id in choices):
+
+            member["movie_choices"] = {
+                legacy_ids.get(movie_id, movie_id): choice
+                for movie_id, choice in choices.items()
+            }
+            changed = True
+
+    mutual_likes = room_data.get("mutual_likes", {})
+
+    if any(movie_id in legacy_ids for movie_id in mutual_likes):
+
+        migrated = {}
+
+        for movie_id, likers in mutual_likes.items():
+
+            merged = migrated.setdefault(legacy_ids.get(movie_id, movie_id), [])
+            merged.extend(member_id for member_id in likers if member_id not in merged)
+
+        room_data["mutual_likes"] = migrated
+        changed = True
+
+    return changed
+
+
+def migrate_record(record, legacy_ids):
+
+    if record.get("op") == "create" and isinstance(record.get("data"), dict):
+        return migrate_room(record["data"], legacy_ids)
+
+    if record.get("movie") in legacy_ids:
+
+        record["movie"] = legacy_ids[record["movie"]]
+
+        return True
+
+    return False
+
+
+def check_record(rooms, record):
+
+    op = record.get("op")
+    room_data = rooms.get(record.get("room"))
+
+    if op == "create":
+        return isinstance(record.get("data"), dict)
+
+    if room_data is None:
+        return False
+
+    if op == "delete":
+        return True
+
+    if op not in APPLIERS:
+
+        logger.warning(f"Skipping unknown room record op: {op}")
+
+        return False
+
+    if op in MEMBER_OPS and record.get("member") not in room_data["members"]:
+
+        logger.warning(
+            f"Skipping {op} record for member {record.get('member')} "
+            f"not in room {record.get('room')}"
+        )
+
+        return False
+
+    if op == "vote" and record.get("choice") not in ("like", "dislike"):
+        return False
+
+    return True
+
+
+def apply_record(rooms, record):
+
+    op = record["op"]
+    code = record["room"]
+    seq = record.get("seq", 0)
+    at = record.get("at")
+    room_data = rooms.get(code)
+
+    if op == "create":
+
+        if room_data is not None and room_data.get("seq", 0) >= seq:
+            return False
+
+        room_data = record["data"]
+        room_data["seq"] = seq
+
+        if at is not None:
+            room_data.setdefault("created", at)
+            room_data["active"] = at
+
+        rooms[code] = room_data
+
+        return True
+
+    if room_data is None or room_data.get("seq", 0) >= seq:
+        return False
+
+    if not check_record(rooms, record):
+        return False
+
+    if op == "delete":
+
+        del rooms[code]
+
+        return True
+
+    APPLIERS[op](room_data, record)
+    room_data["seq"] = seq
+
+    if op in VERSIONED_OPS:
+        room_data["version"] = room_data.get("version", 0) + 1
+
+    if at is not None:
+        room_data["active"] = at
+
+    return True
@@ -0,0 +1,645 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from storage.locks import RoomLocks
+from storage.records import VERSIONED_OPS, apply_record, check_record
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    code TEXT PRIMARY KEY,
+    host TEXT,
+    chat_started INTEGER NOT NULL DEFAULT 0,
+    voting_complete INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL DEFAULT 0,
+    created INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS members (
+    room TEXT NOT NULL,
+    member TEXT NOT NULL,
+    name TEXT,
+    is_host INTEGER NOT NULL DEFAULT 0,
+    survey TEXT,
+    suggested TEXT,
+    joined INTEGER NOT NULL,
+    PRIMARY KEY (room, member)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS choices (
+    room TEXT NOT NULL,
+    member TEXT NOT NULL,
+    movie TEXT NOT NULL,
+    choice TEXT NOT NULL,
+    voted INTEGER NOT NULL,
+    PRIMARY KEY (room, member, movie)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS mutual_likes (
+    room TEXT NOT NULL,
+    movie TEXT NOT NULL,
+    member TEXT NOT NULL,
+    liked INTEGER NOT NULL,
+    PRIMARY KEY (room, movie, member)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS mutual_likes_by_time ON mutual_likes (room, liked);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    name TEXT,
+    message TEXT
+);
+
+CREATE INDEX IF NOT EXISTS messages_by_room ON messages (room, id);
+"""
+
+ROOM_INDEXES = """
+CREATE INDEX IF NOT EXISTS rooms_by_active ON rooms (active);
+CREATE INDEX IF NOT EXISTS rooms_by_created ON rooms (created);
+"""
+
+ROOM_TABLES = ("choices", "mutual_likes", "members", "messages")
+
+
+class SqliteRoomStore:
+
+    def __init__(
+        self,
+        path,
+        import_from=None,
+        lock_warn_after=0.05,
+        timeout=10.0,
+        legacy_ids=None,
+    ):
+
+        self.path = Path(path)
+        self.timeout = timeout
+        self.legacy_ids = legacy_ids or {}
+        self.locks = RoomLocks(warn_after=lock_warn_after)
+        self.listeners = []
+
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        conn.executescript(ROOM_INDEXES)
+
+        if import_from is not None:
+            self._import_json(Path(import_from))
+
+        self._migrate_ids(conn)
+
+    def _conn(self):
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or self._local.pid != os.getpid():
+
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def _migrate(self, conn):
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(rooms)")}
+        now = int(time.time())
+
+        for column in ("created", "active"):
+
+            if column not in columns:
+
+                conn.execute(
+                    f"ALTER TABLE rooms ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                )
+                conn.execute(f"UPDATE rooms SET {column} = ?", (now,))
+
+        if "version" not in columns:
+            conn.execute(
+                "ALTER TABLE rooms ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+            )
+
+    def _migrate_ids(self, conn):
+
+        if not self.legacy_ids:
+            return
+
+        moved = 0
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            for table in ("choices", "mutual_likes"):
+
+                for (movie_id,) in conn.execute(
+                    f"SELECT DISTINCT movie FROM {table}"
+                ).fetchall():
+
+                    if movie_id in self.legacy_ids:
+
+                        conn.execute(
+                            f"UPDATE OR REPLACE {table} SET movie = ? WHERE movie = ?",
+                            (self.legacy_ids[movie_id], movie_id),
+                        )
+                        moved += 1
+
+            conn.execute("COMMIT")
+
+        except Exception:
+
+            conn.execute("ROLLBACK")
+            raise
+
+        if moved:
+            logger.info(f"Moved {moved} CSV row ids to catalog ids in {self.path}")
+
+    def _import_json(self, json_path):
+
+        conn = self._conn()
+
+        if conn.execute("SELECT 1 FROM rooms LIMIT 1").fetchone() is not None:
+            return
+
+        if not json_path.exists():
+            return
+
+        try:
+
+            with open(json_path, "r") as f:
+                rooms = json.load(f)
+
+        except json.JSONDecodeError as e:
+
+            logger.error(f"Could not import rooms from {json_path}: {e}")
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            for code, room_data in rooms.items():
+                self._insert_room(conn, code, room_data, room_data.get("seq", 1))
+
+            conn.execute("COMMIT")
+
+        except Exception:
+
+            conn.execute("ROLLBACK")
+            raise
+
+        logger.info(f"Imported {len(rooms)} rooms from {json_path} into {self.path}")
+
+    def start(self):
+
+        pass
+
+    def __contains__(self, code):
+
+        row = (
+            self._conn()
+            .execute("SELECT 1 FROM rooms WHERE code = ?", (code,))
+            .fetchone()
+        )
+
+        return row is not None
+
+    def __len__(self):
+
+        return self._conn().execute("SELECT COUNT(*) FROM rooms").fetchone()[0]
+
+    def codes(self):
+
+        return [row[0] for row in self._conn().execute("SELECT code FROM rooms")]
+
+    def get(self, code):
+
+        conn = self._conn()
+
+        if conn.in_transaction:
+            return self._get(conn, code)
+
+        # A deferred transaction only takes a read snapshot, so the room's rows
+        # are loaded consistently without blocking writers to other rooms.
+        conn.execute("BEGIN")
+
+        try:
+            return self._get(conn, code)
+        finally:
+            conn.execute("COMMIT")
+
+    def _get(self, conn, code):
+
+        row = conn.execute("SELECT seq FROM rooms WHERE code = ?", (code,)).fetchone()
+
+        if row is None:
+
+            with self._cache_lock:
+                self._cache.pop(code, None)
+
+            return None
+
+        cached = self._cache.get(code)
+
+        if cached is not None and cached.get("seq") == row[0]:
+            return cached
+
+        room_data = self._load_room(conn, code)
+
+        with self._cache_lock:
+            self._cache[code] = room_data
+
+        return room_data
+
+    def _load_room(self, conn, code):
+
+        (
+            host,
+            chat_started,
+            voting_complete,
+            seq,
+            created,
+            active,
+            version,
+        ) = conn.execute(
+            "SELECT host, chat_started, voting_complete, seq, created, active, version "
+            "FROM rooms WHERE code = ?",
+            (code,),
+        ).fetchone()
+
+        members = {}
+
+        for member, name, is_host, survey, suggested in conn.execute(
+            "SELECT member, name, is_host, survey, suggested FROM members "
+            "WHERE room = ? ORDER BY joined",
+            (code,),
+        ):
+
+            members[member] = {
+                "name": name,
+                "is_host": bool(is_host),
+                "survey": json.loads(survey) if survey else None,
+                "movie_choices": {},
+            }
+
+            if suggested is not None:
+                members[member]["suggested_from_llm"] = json.loads(suggested)
+
+        for member, movie, choice in conn.execute(
+            "SELECT member, movie, choice FROM choices WHERE room = ? ORDER BY voted",
+            (code,),
+        ):
+
+            if member in members:
+                members[member]["movie_choices"][movie] = choice
+
+        mutual_likes = {}
+
+        for movie, member in conn.execute(
+            "SELECT movie, member FROM mutual_likes WHERE room = ? ORDER BY liked",
+            (code,),
+        ):
+
+            mutual_likes.setdefault(movie, []).append(member)
+
+        messages = [
+            {"name": name, "message": message}
+            for name, message in conn.execute(
+                "SELECT name, message FROM messages WHERE room = ? ORDER BY id",
+                (code,),
+            )
+        ]
+
+        room_data = {
+            "members": members,
+            "host": host,
+            "chat_started": bool(chat_started),
+            "data": messages,
+            "mutual_likes": mutual_likes,
+            "seq": seq,
+            "created": created,
+            "active": active,
+            "version": version,
+        }
+
+        if voting_complete:
+            room_data["voting_complete"] = True
+
+        return room_data
+
+    def _insert_room(self, conn, code, room_data, seq):
+
+        now = int(time.time())
+
+        conn.execute(
+            "INSERT OR REPLACE INTO rooms "
+            "(code, host, chat_started, voting_complete, seq, created, active, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                code,
+                room_data.get("host"),
+                int(bool(room_data.get("chat_started", False))),
+                int(bool(room_data.get("voting_complete", False))),
+                seq,
+                room_data.get("created") or now,
+                room_data.get("active") or now,
+                room_data.get("version", 0),
+            ),
+        )
+
+        for joined, (member_id, member) in enumerate(room_data["members"].items()):
+
+            self._insert_member(conn, code, member_id, member, joined)
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO choices (room, member, movie, choice, voted) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (code, member_id, movie_id, choice, voted)
+                    for voted, (movie_id, choice) in enumerate(
+                        member.get("movie_choices", {}).items()
+                    )
+                ],
+            )
+
+        liked = 0
+
+        for movie_id, likers in room_data.get("mutual_likes", {}).items():
+
+            for member_id in likers:
+
+                conn.execute(
+                    "INSERT OR IGNORE INTO mutual_likes (room, movie, member, liked) "
+                    "VALUES (?, ?, ?, ?)",
+                    (code, movie_id, member_id, liked),
+                )
+                liked += 1
+
+        conn.executemany(
+            "INSERT INTO messages (room, name, message) VALUES (?, ?, ?)",
+            [
+                (code, content.get("name"), content.get("message"))
+                for content in room_data.get("data", [])
+            ],
+        )
+
+    def _insert_member(self, conn, code, member_id, member, joined):
+
+        suggested = member.get("suggested_from_llm")
+
+        conn.execute(
+            "INSERT OR REPLACE INTO members "
+            "(room, member, name, is_host, survey, suggested, joined) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                code,
+                member_id,
+                member.get("name"),
+                int(bool(member.get("is_host", False))),
+                json.dumps(member.get("survey")),
+                json.dumps(suggested) if suggested is not None else None,
+                joined,
+            ),
+        )
+
+    def _write_record(self, conn, record):
+
+        op = record["op"]
+        code = record["room"]
+        seq = record["seq"]
+
+        if op == "create":
+
+            self._insert_room(
+                conn,
+                code,
+                {**record["data"], "created": record["at"], "active": record["at"]},
+                seq,
+            )
+
+            return
+
+        if op == "delete":
+
+            for table in ROOM_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE room = ?", (code,))
+
+            conn.execute("DELETE FROM rooms WHERE code = ?", (code,))
+
+            return
+
+        if op == "join":
+
+            self._insert_member(conn, code, record["member"], record["data"], seq)
+
+        elif op == "vote":
+
+            conn.execute(
+                "INSERT INTO choices (room, member, movie, choice, voted) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (room, member, movie) DO UPDATE SET choice = excluded.choice",
+                (code, record["member"], record["movie"], record["choice"], seq),
+            )
+
+            if record["choice"] == "like":
+
+                conn.execute(
+                    "INSERT OR IGNORE INTO mutual_likes (room, movie, member, liked) "
+                    "VALUES (?, ?, ?, ?)",
+                    (code, record["movie"], record["member"], seq),
+                )
+
+            else:
+
+                conn.execute(
+                    "DELETE FROM mutual_likes WHERE room = ? AND movie = ? AND member = ?",
+                    (code, record["movie"], record["member"]),
+                )
+
+        elif op == "survey":
+
+            conn.execute(
+                "UPDATE members SET survey = ? WHERE room = ? AND member = ?",
+                (json.dumps(record["data"]), code, record["member"]),
+            )
+
+        elif op == "suggest":
+
+            conn.execute(
+                "UPDATE members SET suggested = ? WHERE room = ? AND member = ?",
+                (json.dumps(record["data"]), code, record["member"]),
+            )
+
+        elif op == "msg":
+
+            conn.execute(
+                "INSERT INTO messages (room, name, message) VALUES (?, ?, ?)",
+                (code, record["data"].get("name"), record["data"].get("message")),
+            )
+
+        elif op == "start":
+
+            conn.execute("UPDATE rooms SET chat_started = 1 WHERE code = ?", (code,))
+
+        elif op == "done":
+
+            conn.execute("UPDATE rooms SET voting_complete = 1 WHERE code = ?", (code,))
+
+        conn.execute(
+            "UPDATE rooms SET seq = ?, active = ?, version = version + ? WHERE code = ?",
+            (seq, record["at"], int(op in VERSIONED_OPS), code),
+        )
+
+    @contextmanager
+    def _write_transaction(self, code):
+
+        conn = self._conn()
+
+        if conn.in_transaction:
+
+            yield conn
+
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            yield conn
+
+        except BaseException:
+
+            conn.execute("ROLLBACK")
+
+            with self._cache_lock:
+                self._cache.pop(code, None)
+
+            raise
+
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self, code):
+
+        with self.locks.hold(code):
+            yield self.get(code)
+
+    def create(self, code, room_data):
+
+        self.apply(code, "create", data=room_data)
+
+        return self.get(code)
+
+    def delete(self, code):
+
+        self.apply(code, "delete")
+
+    def apply(self, code, op, **fields):
+
+        with self.locks.lock_for(code), self._write_transaction(code) as conn:
+
+            room_data = self.get(code)
+
+            if room_data is None and op != "create":
+                return False
+
+            previous = room_data["seq"] if room_data is not None else None
+            seq = previous + 1 if previous is not None else 1
+            record = {
+                "seq": seq,
+                "op": op,
+                "room": code,
+                "at": int(time.time()),
+                **fields,
+            }
+
+            if not check_record({code: room_data} if room_data else {}, record):
+                return False
+
+            self._write_record(conn, record)
+
+            with self._cache_lock:
+                applied = apply_record(self._cache, record)
+
+            if applied:
+
+                for listener in self.listeners:
+                    listener(record, previous)
+
+        return applied
+
+    def expired(self, idle_before, created_before):
+
+        return [
+            row[0]
+            for row in self._conn().execute(
+                "SELECT code FROM rooms WHERE active < ? "
+                "UNION SELECT code FROM rooms WHERE created < ?",
+                (idle_before, created_before),
+            )
+        ]
+
+    def encoded_size(self, code):
+
+        room_data = self.get(code)
+
+        if room_data is None:
+            return 0
+
+        return len(json.dumps(room_data, separators=(",", ":")))
+
+    def stats(self):
+
+        return {
+            "backend": "sqlite",
+            "rooms": len(self),
+            "locks": self.locks.stats(),
+        }
+
+    def clear(self):
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+
+        for table in ROOM_TABLES + ("rooms",):
+            conn.execute(f"DELETE FROM {table}")
+
+        conn.execute("COMMIT")
+
+        with self._cache_lock:
+            self._cache.clear()
+
+    def flush(self):
+
+        self._conn().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+        return 0
+
+    def close(self):
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+        logger.info(f"SQLite room store at {self.path} closed")
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from storage.journal import Journal
+from storage.locks import RoomLocks
+from storage.records import apply_record, check_record, migrate_record, migrate_room
+
+logger = logging.getLogger(__name__)
+
+
+class RoomStore:
+
+    def __init__(
+        self,
+        path,
+        flush_interval=30.0,
+        flush_batch=1000,
+        journal_fsync=False,
+        lock_warn_after=0.05,
+        legacy_ids=None,
+    ):
+
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.legacy_ids = legacy_ids or {}
+
+        self.rooms = {}
+        self.dirty = set()
+        self.seq = 0
+        self._encoded = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.locks = RoomLocks(warn_after=lock_warn_after)
+        self.listeners = []
+
+        self.journal = Journal(self.path.with_suffix(".journal"), fsync=journal_fsync)
+
+        self.load()
+
+    def load(self):
+
+        rooms = {}
+
+        if self.path.exists():
+
+            try:
+
+                with open(self.path, "r") as f:
+                    rooms = json.load(f)
+
+            except json.JSONDecodeError as e:
+
+                logger.error(f"Could not parse {self.path}, starting empty: {e}")
+                rooms = {}
+
+        now = int(time.time())
+
+        for room_data in rooms.values():
+            room_data.setdefault("created", now)
+            room_data.setdefault("active", now)
+
+        migrated = {
+            code
+            for code, room_data in rooms.items()
+            if migrate_room(room_data, self.legacy_ids)
+        }
+        seq = max((room_data.get("seq", 0) for room_data in rooms.values()), default=0)
+        replayed = 0
+
+        for record in self.journal.replay():
+
+            if migrate_record(record, self.legacy_ids):
+                migrated.add(record["room"])
+
+            try:
+
+                if apply_record(rooms, record):
+                    replayed += 1
+
+            except (KeyError, TypeError, AttributeError) as e:
+
+                logger.warning(f"Skipping journal record that failed to apply: {e}")
+
+            seq = max(seq, record.get("seq", 0))
+
+        if migrated:
+            logger.info(f"Moved {len(migrated)} rooms from CSV row ids to catalog ids")
+
+        with self._lock:
+            self.rooms = rooms
+            self.seq = seq
+            self.dirty = set(rooms.keys()) if replayed else set()
+            self.dirty |= migrated & set(rooms.keys())
+            self._encoded = {
+                code: json.dumps(room_data, separators=(",", ":"))
+                for code, room_data in rooms.items()
+            }
+
+        logger.info(
+            f"Loaded {len(rooms)} rooms from {self.path}, replayed {replayed} journal records"
+        )
+
+        if self.dirty:
+            self.flush()
+
+    def start(self):
+
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="room-store-flush", daemon=True
+        )
+        self._thread.start()
+
+    def __contains__(self, code):
+
+        return code in self.rooms
+
+    def __len__(self):
+
+        return len(self.rooms)
+
+    def codes(self):
+
+        return list(self.rooms.keys())
+
+    def get(self, code):
+
+        return self.rooms.get(code)
+
+    def create(self, code, room_data):
+
+        self.apply(code, "create", data=room_data)
+
+        return self.rooms[code]
+
+    def delete(self, code):
+
+        self.apply(code, "delete")
+
+    @contextmanager
+    def transaction(self, code):
+
+        with self.locks.hold(code):
+            yield self.rooms.get(code)
+
+    def apply(self, code, op, **fields):
+
+        # The room lock orders records within a room; the store lock is only
+        # held to number and journal them, so rooms do not queue behind each
+        # other's listeners.
+        with self.locks.lock_for(code):
+
+            with self._lock:
+
+                record = {
+                    "seq": self.seq + 1,
+                    "op": op,
+                    "room": code,
+                    "at": int(time.time()),
+                    **fields,
+                }
+
+                if not check_record(self.rooms, record):
+                    return False
+
+                self.seq += 1
+                self.journal.append(record)
+                self.dirty.add(code)
+                pending = self.journal.records_written
+
+            previous = self.rooms.get(code, {}).get("seq")
+            applied = apply_record(self.rooms, record)
+
+            if applied:
+
+                for listener in self.listeners:
+                    listener(record, previous)
+
+        if pending >= self.flush_batch:
+            self._wake.set()
+
+        return applied
+
+    def expired(self, idle_before, created_before):
+
+        # Rooms are created and deleted under their own locks, so scan a copy
+        # of the room table rather than the live dict.
+        return [
+            code
+            for code, room_data in list(self.rooms.items())
+            if (room_data.get("active") or idle_before) < idle_before
+            or (room_data.get("created") or created_before) < created_before
+        ]
+
+    def encoded_size(self, code):
+
+        encoded = self._encoded.get(code)
+
+        if encoded is None:
+            encoded = self._encode(code)
+
+        return len(encoded) if encoded is not None else 0
+
+    def stats(self):
+
+        return {
+            "backend": "json",
+            "rooms": len(self.rooms),
+            "seq": self.seq,
+            "locks": self.locks.stats(),
+        }
+
+    def clear(self):
+
+        with self._flush_lock:
+
+            with self._lock:
+                self.rooms = {}
+                self._encoded = {}
+                self.dirty.clear()
+                self._write("{}")
+                self.journal.reset()
+
+    def flush(self):
+
+        with self._flush_lock:
+            return self._snapshot()
+
+    def _encode(self, code):
+
+        with self.locks.lock_for(code):
+
+            room_data = self.rooms.get(code)
+
+            if room_data is not None:
+                return json.dumps(room_data, separators=(",", ":"))
+
+        self.locks.discard(code)
+
+        return None
+
+    def _snapshot(self):
+
+        with self._lock:
+
+            if not self.dirty:
+                return 0
+
+            dirty = self.dirty
+            self.dirty = set()
+            self.journal.rotate()
+
+        # Every record in the rotated journal was journaled under its room's
+        # lock, so encoding each room under that lock sees it applied.
+        for code in dirty:
+
+            encoded = self._encode(code)
+
+            if encoded is None:
+                self._encoded.pop(code, None)
+            else:
+                self._encoded[code] = encoded
+
+        payload = (
+            "{"
+            + ",".join(
+                f"{json.dumps(code)}:{encoded}"
+                for code, encoded in list(self._encoded.items())
+            )
+            + "}"
+        )
+
+        if not self._write(payload):
+            return 0
+
+        self.journal.discard_rotated()
+
+        logger.debug(f"Snapshotted {len(dirty)} changed rooms to {self.path}")
+
+        return len(dirty)
+
+    def _write(self, payload):
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+
+        try:
+
+            with open(tmp_path, "w") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.path)
+
+        except OSError as e:
+
+            logger.error(f"Failed to write rooms snapshot to {self.path}: {e}")
+
+            return False
+
+        return True
+
+    def _run(self):
+
+        while not self._stop.is_set():
+
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Background room snapshot failed: {e}", exc_info=True)
+
+    def close(self):
+
+        self._stop.set()
+        self._wake.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        self.flush()
+        self.journal.close()
+        logger.info(f"Room store closed, {len(self.rooms)} rooms on disk")
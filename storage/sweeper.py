@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def room_outcome(code, room_data, ended):
+
+    members = room_data.get("members", {})
+    votes = []
+
+    for member in members.values():
+
+        choices = member.get("movie_choices", {})
+        votes.append(
+            [
+                [movie_id for movie_id, choice in choices.items() if choice == "like"],
+                [
+                    movie_id
+                    for movie_id, choice in choices.items()
+                    if choice == "dislike"
+                ],
+            ]
+        )
+
+    top = sorted(
+        room_data.get("mutual_likes", {}).items(),
+        key=lambda item: len(item[1]),
+        reverse=True,
+    )[:3]
+
+    return {
+        "room": code,
+        "created": room_data.get("created"),
+        "ended": ended,
+        "complete": bool(room_data.get("voting_complete", False)),
+        "members": len(members),
+        "top": [[movie_id, len(likers)] for movie_id, likers in top],
+        "votes": votes,
+    }
+
+
+class RoomSweeper:
+
+    def __init__(
+        self,
+        store,
+        idle_ttl=6 * 3600,
+        max_age=48 * 3600,
+        interval=60.0,
+        archive_path=None,
+    ):
+
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        self.interval = interval
+        self.archive_path = Path(archive_path) if archive_path else None
+
+        self.sweeps = 0
+        self.evicted = 0
+        self.archived = 0
+        self.bytes_reclaimed = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+
+        if self._thread is not None or self.interval <= 0:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="room-sweeper", daemon=True
+        )
+        self._thread.start()
+
+    def sweep(self, now=None):
+
+        now = int(now if now is not None else time.time())
+        idle_before = now - self.idle_ttl if self.idle_ttl > 0 else 0
+        created_before = now - self.max_age if self.max_age > 0 else 0
+
+        evicted = 0
+
+        for code in self.store.expired(idle_before, created_before):
+
+            with self.store.transaction(code) as room_data:
+
+                if room_data is None:
+                    continue
+
+                active = room_data.get("active") or now
+                created = room_data.get("created") or now
+
+                if active >= idle_before and created >= created_before:
+                    continue
+
+                size = self.store.encoded_size(code)
+                outcome = room_outcome(code, room_data, now)
+                self.store.delete(code)
+
+            self.store.locks.discard(code)
+            self._archive(outcome)
+
+            evicted += 1
+            self.evicted += 1
+            self.bytes_reclaimed += size
+
+            logger.info(f"Evicted room {code} ({size} bytes)")
+
+        self.sweeps += 1
+
+        return evicted
+
+    def _archive(self, outcome):
+
+        if self.archive_path is None or not any(
+            likes or dislikes for likes, dislikes in outcome["votes"]
+        ):
+            return
+
+        try:
+
+            with open(self.archive_path, "a") as f:
+                f.write(json.dumps(outcome, separators=(",", ":")) + "\n")
+
+            self.archived += 1
+
+        except OSError as e:
+
+            logger.error(f"Failed to archive room {outcome['room']}: {e}")
+
+    def _run(self):
+
+        while not self._stop.wait(self.interval):
+
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Room sweep failed: {e}", exc_info=True)
+
+    def stats(self):
+
+        return {
+            "live_rooms": len(self.store),
+            "sweeps": self.sweeps,
+            "evicted_rooms": self.evicted,
+            "archived_rooms": self.archived,
+            "bytes_reclaimed": self.bytes_reclaimed,
+        }
+
+    def close(self):
+
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None